@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+"""
+Benchmark the HTML-to-text backends over a corpus of saved pages.
+
+Save some product pages as .html files in a directory (e.g. with
+`curl -L -o data/pages/ebay-1.html <url>`), then run:
+
+    python scripts/bench_html_text.py data/pages --repeat 5
+
+For each installed backend it reports pages/s and MB/s, and how closely its
+output matches the html.parser reference (exact matches and mean word-set
+similarity).
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Get the project root directory
+SCRIPT_DIR = Path(__file__).parent
+PROJECT_ROOT = SCRIPT_DIR.parent
+SRC_DIR = PROJECT_ROOT / "src"
+sys.path.insert(0, str(SRC_DIR))
+
+from html_text import BACKENDS, available_backends  # noqa: E402
+
+
+def load_corpus(corpus_dir):
+    pages = []
+    for path in sorted(Path(corpus_dir).glob("**/*.htm*")):
+        # Keyed by relative path, so same-named pages in different directories stay apart
+        pages.append((path.relative_to(corpus_dir).as_posix(), path.read_bytes()))
+    return pages
+
+
+def word_similarity(a, b):
+    """Jaccard similarity of the word sets of two texts"""
+    words_a, words_b = set(a.split()), set(b.split())
+    if not words_a and not words_b:
+        return 1.0
+    return len(words_a & words_b) / len(words_a | words_b)
+
+
+def run_backend(extract, pages, repeat):
+    """Return (outputs, best total seconds over repeat runs)"""
+    outputs = {}
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for name, body in pages:
+            outputs[name] = extract(body)
+        timings.append(time.perf_counter() - start)
+    return outputs, min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark HTML-to-text backends on saved pages")
+    parser.add_argument("corpus", help="Directory with saved .html pages")
+    parser.add_argument("--repeat", "-r", type=int, default=3, help="Runs per backend (best is reported)")
+    parser.add_argument("--backends", "-b", nargs="+", help="Backends to compare (default: all installed)")
+    args = parser.parse_args()
+
+    pages = load_corpus(args.corpus)
+    if not pages:
+        print(f"No .html files found in {args.corpus}")
+        sys.exit(1)
+    total_mb = sum(len(body) for _, body in pages) / (1024 * 1024)
+    print(f"Corpus: {len(pages)} pages, {total_mb:.1f} MB")
+
+    names = args.backends or available_backends()
+    reference, ref_seconds = run_backend(BACKENDS["html.parser"], pages, args.repeat)
+
+    print(f"{'backend':<12} {'pages/s':>9} {'MB/s':>7} {'speedup':>8} {'exact':>7} {'similarity':>11}")
+    for name in names:
+        if name == "html.parser":
+            outputs, seconds = reference, ref_seconds
+        else:
+            outputs, seconds = run_backend(BACKENDS[name], pages, args.repeat)
+        exact = sum(1 for page, _ in pages if outputs[page] == reference[page])
+        similarity = statistics.mean(word_similarity(outputs[page], reference[page]) for page, _ in pages)
+        print(
+            f"{name:<12} {len(pages) / seconds:>9.1f} {total_mb / seconds:>7.2f} "
+            f"{ref_seconds / seconds:>7.1f}x {exact:>3}/{len(pages):<3} {similarity:>11.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
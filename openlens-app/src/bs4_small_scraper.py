@@ -1,171 +1,290 @@
-import requests
-from bs4 import BeautifulSoup
-import csv
 import logging
-from urllib.parse import urlparse
-import time
 import os
 import argparse
 from config import Config
+from results import read_results_csv
+from page_fetcher import get_page_fetcher, shutdown_page_fetcher
+from parse_pool import submit_parse, shutdown_parse_pool
+from url_cache import close_url_cache, get_url_cache
+from domain_stats import get_domain_stats, host_of
+from near_duplicates import NearDuplicateFilter
+from token_budget import context_budget
 import concurrent.futures
 import re
 
 # Setup logging
 logger = logging.getLogger(__name__)
 
-def get_text_from_url(url, timeout=10):
-    """Extract plain text from a URL"""
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-        'Accept-Language': 'en-US,en;q=0.5',
-        'Referer': 'https://www.google.com/',
-        'DNT': '1',
-    }
+def byte_budget(source_char_limit):
+    """Bytes of HTML to read for a source whose text will be cut to source_char_limit"""
+    return min(Config.FETCH_MAX_BYTES, max(Config.FETCH_MIN_BYTES, source_char_limit * Config.FETCH_BYTES_PER_CHAR))
+
+def format_source_info(result):
+    """Header line that introduces a source in the scraped text"""
+    source_info = f"Source: {result.domain}"
+    if result.description:
+        source_info += f" - {result.description}"
+    return source_info
+
+def is_google_domain(netloc):
+    return re.match(r'(www\.)?google\.[a-z]+', netloc) is not None
+
+def _resolve(future, result=None, error=None):
+    """Complete future unless it has been cancelled in the meantime"""
+    try:
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+    except concurrent.futures.InvalidStateError:
+        pass
+
+def _submit_source(result, source_char_limit):
+    """Start fetching a LensResult; returns a future for its (source_info, excerpt) or None.
+
+    Cancelling the returned future also cancels the download or parse behind it.
+    """
+    future = concurrent.futures.Future()
+    if is_google_domain(result.domain):
+        logger.info(f"Skipping Google domain: {result.domain}")
+        future.set_result(None)
+        return future
+    
+    # Popular pages are served from the URL cache, or revalidated with a conditional request
+    cache = get_url_cache()
+    cached = cache.lookup(result.url) if cache else None
+    if cached is not None and not cached.covers(source_char_limit):
+        cache.record_miss()
+        cached = None
+    if cached is not None and cache.is_fresh(cached):
+        cache.record_hit(cached)
+        logger.info(f"Using cached text for {result.url}")
+        future.set_result((format_source_info(result), cached.text[:source_char_limit]))
+        return future
+    
+    # Hosts that keep failing are skipped until their cool-down ends
+    if not get_domain_stats().allow(result.domain):
+        logger.info(f"Skipping {result.url}: circuit open for {result.domain}")
+        stale = None
+        if cached is not None:
+            cache.record_hit(cached)
+            stale = (format_source_info(result), cached.text[:source_char_limit])
+        future.set_result(stale)
+        return future
+    
+    inner = []  # fetch and parse futures, cancelled along with the returned future
+    
+    def parse(fetched):
+        # Hand the raw body to a parser process as soon as the download finishes
+        if future.cancelled() or fetched.cancelled():
+            return
+        try:
+            page = fetched.result()
+            if cached is not None and (page is None or not page.not_modified):
+                # The stale entry could not be reused
+                cache.record_miss()
+            if page is None:
+                # Skip URLs with errors
+                _resolve(future)
+                return
+            if page.not_modified and cached is not None:
+                cache.revalidated(cached)
+                logger.info(f"{result.url} not modified, using cached text")
+                _resolve(future, (format_source_info(result), cached.text[:source_char_limit]))
+                return
+            parsed = submit_parse(page.body, page.charset, source_char_limit)
+        except Exception as e:
+            _resolve(future, error=e)
+            return
+        inner.append(parsed)
+        if future.cancelled():
+            parsed.cancel()
+        parsed.add_done_callback(lambda done: _finish_source(done, future, page, result, source_char_limit))
+    
+    def cancel_inner(done):
+        if done.cancelled():
+            for pending in inner:
+                pending.cancel()
     
+    fetch = get_page_fetcher().fetch(
+        result.url,
+        max_bytes=byte_budget(source_char_limit),
+        headers=cached.validators() if cached is not None else None,
+    )
+    inner.append(fetch)
+    future.add_done_callback(cancel_inner)
+    fetch.add_done_callback(parse)
+    return future
+
+def _finish_source(parsed, future, page, result, char_limit):
+    if parsed.cancelled():
+        return
     try:
-        logger.info(f"Requesting content from {url}")
-        response = requests.get(url, headers=headers, timeout=timeout)
-        response.raise_for_status()
-        
-        # Parse with BeautifulSoup
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Remove script and style tags
-        for script_or_style in soup(['script', 'style', 'header', 'footer', 'nav']):
-            script_or_style.decompose()
+        excerpt = parsed.result()
+    except Exception as e:
+        logger.error(f"Unexpected error processing {page.url}: {e}")
+        _resolve(future)
+        return
+    logger.info(f"Successfully extracted {len(excerpt)} chars from {page.url}")
+    get_domain_stats().record_text(host_of(page.url), len(excerpt))
+    cache = get_url_cache()
+    if cache and excerpt:
+        cache.store(page.url, excerpt, char_limit, page.etag, page.last_modified, len(page.body))
+    _resolve(future, (format_source_info(result), excerpt))
+
+class OrderedAssembler:
+    """Builds the scraped text in rank order while sources finish in any order.
+
+    Each source is appended as soon as every higher-ranked source has finished,
+    and nothing more is taken once char_limit is reached. With a dedup filter,
+    sources that nearly repeat a higher-ranked one are dropped so their share of
+    the budget goes to the next distinct source.
+    """
+
+    def __init__(self, char_limit, dedup=None):
+        self.char_limit = char_limit
+        self.dedup = dedup
+        self.parts = []
+        self.length = 0
+        self.sources = 0
+        self.duplicates = 0
+        self._ready = {}
+        self._next = 0
+
+    @property
+    def full(self):
+        return self.length >= self.char_limit
+
+    def add(self, index, extracted):
+        """Record a finished source (None if it was skipped) and extend the in-order prefix"""
+        self._ready[index] = extracted
+        while self._next in self._ready and not self.full:
+            self._append(self._ready.pop(self._next))
+            self._next += 1
+
+    def _append(self, extracted):
+        if not extracted:  # Skip None results (errors or Google domains)
+            return
+        source_info, content = extracted
         
-        # Get text and clean it up
-        text = soup.get_text(separator=' ', strip=True)
+        if self.dedup is not None:
+            original = self.dedup.duplicate_of(content, source_info)
+            if original is not None:
+                logger.info(f"Dropping near-duplicate source ({source_info}), same content as ({original})")
+                self.duplicates += 1
+                return
         
-        # Remove extra whitespace and normalize
-        text = ' '.join(text.split())
+        # Add source info
+        self.parts.append(source_info)
+        self.length += len(source_info) + 1  # +1 for newline
+        self.sources += 1
         
-        logger.info(f"Successfully extracted {len(text)} chars from {url}")
-        return text
+        # Add content
+        content_to_add = content[:self.char_limit - self.length]
+        if content_to_add:
+            self.parts.append(content_to_add)
+            self.length += len(content_to_add) + 1  # +1 for newline
         
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Error fetching {url}: {e}")
-        return None
-    except Exception as e:
-        logger.error(f"Unexpected error processing {url}: {e}")
-        return None
-
-def process_url(url_info, source_char_limit):
-    """Process a single URL and return the extracted content"""
-    url, description = url_info
-    
-    # Format the source info
-    netloc = urlparse(url).netloc
-    source_info = f"Source: {netloc}"
-    if description:
-        source_info += f" - {description}"
-    
-    # Skip Google domains
-    if re.match(r'(www\.)?google\.[a-z]+', netloc):
-        logger.info(f"Skipping Google domain: {netloc}")
-        return None
-    
-    # Extract content
-    content = get_text_from_url(url)
-    if content is None:
-        # Skip URLs with errors
-        return None
-    
-    # Limit the content to source_char_limit and include source info
-    excerpt = content[:source_char_limit]
-    return (source_info, excerpt)
+        if self.full:
+            logger.info(f"Reached character limit of {self.char_limit}. Stopping.")
+
+    def text(self):
+        return "\n".join(self.parts)[:self.char_limit]
+
+def write_text_file(output_txt_path, text):
+    """Write scraped text to disk, creating the directory if needed"""
+    os.makedirs(os.path.dirname(output_txt_path) if os.path.dirname(output_txt_path) else ".", exist_ok=True)
+    with open(output_txt_path, 'w', encoding='utf-8') as out_file:
+        out_file.write(text)
+    logger.info(f"Scraped content saved to {output_txt_path}")
 
 def scrape_first_urls(csv_path, output_txt_path, max_urls=None, char_limit=None):
     """Scrape content from the first URLs in the CSV file"""
+    return scrape_links(read_results_csv(csv_path), output_txt_path, max_urls, char_limit)
+
+def scrape_links(links, output_txt_path=None, max_urls=None, char_limit=None, on_source=None):
+    """Scrape content from LensResult records, starting each fetch as soon as its link arrives.
+
+    links may be any iterable, including a generator that is still producing Lens
+    results; it is closed once max_urls links have been taken from it. The text is
+    returned directly and only written to output_txt_path if one is given.
+    on_source(index, link, extracted) is called as each source finishes, with
+    extracted being the (source_info, excerpt) tuple or None if it was skipped.
+    """
     # Use configuration values if not specified
     if max_urls is None:
         max_urls = Config.MAX_URLS_TO_SCRAPE
+    budget = context_budget()
     if char_limit is None:
-        char_limit = Config.MAX_CHARACTERS_IN_SUMMARY
+        char_limit = budget.char_limit
     
-    # Calculate per-source character limit (1/4 of total, but at least 200 chars)
-    source_char_limit = max(200, char_limit // 4)
+    # Each source may fill a share of the LLM's token budget, so nothing is scraped only to be truncated
+    source_char_limit = budget.source_char_limit(char_limit)
     logger.info(f"Per-source character limit: {source_char_limit}")
     
-    urls_to_process = []
+    # Pages are fetched on the shared async fetcher and parsed on the parse pool.
+    # Submit tasks as links arrive and assemble the text in rank order as they finish.
+    dedup = None
+    if Config.DEDUP_ENABLED:
+        dedup = NearDuplicateFilter(
+            threshold=Config.DEDUP_THRESHOLD,
+            num_hashes=Config.DEDUP_NUM_HASHES,
+            shingle_size=Config.DEDUP_SHINGLE_WORDS,
+            min_chars=Config.DEDUP_MIN_CHARS,
+        )
+    assembler = OrderedAssembler(char_limit, dedup)
+    pending = {}  # future -> index
+    submitted = []
     
-    # Read URLs from CSV
-    try:
-        with open(csv_path, 'r', encoding='utf-8') as csv_file:
-            reader = csv.reader(csv_file)
-            next(reader)  # Skip header
-            for i, row in enumerate(reader):
-                if i >= max_urls:
-                    break
-                if row and row[0]:
-                    urls_to_process.append((row[0], row[1] if len(row) > 1 else ""))
-    except Exception as e:
-        logger.error(f"Error reading CSV file {csv_path}: {e}")
-        urls_to_process = []
-    
-    if not urls_to_process:
-        logger.warning("No URLs to process!")
-        return ""
-    
-    # Process URLs in parallel but maintain order
-    all_text = []
-    current_length = 0
-    
-    # Use ThreadPoolExecutor for concurrent processing
-    with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-        # Submit all tasks but keep track of their order
-        future_to_url = {
-            executor.submit(process_url, url_info, source_char_limit): i 
-            for i, url_info in enumerate(urls_to_process)
-        }
-        
-        # Process results in order of submission
-        results = [None] * len(urls_to_process)
-        
-        # As each future completes (in any order)
-        for future in concurrent.futures.as_completed(future_to_url):
-            idx = future_to_url[future]
+    def collect(timeout):
+        done, _ = concurrent.futures.wait(pending, timeout=timeout, return_when=concurrent.futures.FIRST_COMPLETED)
+        for future in done:
+            idx = pending.pop(future)
+            extracted = None
             try:
-                result = future.result()
-                if result:  # Skip None results (errors or Google domains)
-                    results[idx] = result
+                extracted = future.result()
             except Exception as e:
                 logger.error(f"Error processing URL at index {idx}: {e}")
-        
-        # Compile final text in correct order
-        for result in results:
-            if result and current_length < char_limit:
-                source_info, content = result
-                
-                # Add source info
-                all_text.append(source_info)
-                current_length += len(source_info) + 1  # +1 for newline
-                
-                # Add content
-                content_to_add = content[:char_limit - current_length]
-                if content_to_add:
-                    all_text.append(content_to_add)
-                    current_length += len(content_to_add) + 1  # +1 for newline
-                
-                if current_length >= char_limit:
-                    logger.info(f"Reached character limit of {char_limit}. Stopping.")
-                    break
+            if on_source:
+                on_source(idx, submitted[idx], extracted)
+            assembler.add(idx, extracted)
     
-    # Combine all text and ensure we're within char_limit
-    combined_text = "\n".join(all_text)
-    limited_text = combined_text[:char_limit]
+    try:
+        try:
+            for i, result in enumerate(links):
+                pending[_submit_source(result, source_char_limit)] = i
+                submitted.append(result)
+                collect(timeout=0)  # Fold in whatever has already finished
+                if assembler.full or len(submitted) >= max_urls:
+                    break
+        finally:
+            # Release the producer (e.g. a pooled browser) as soon as we have enough links
+            close = getattr(links, 'close', None)
+            if close:
+                close()
+        
+        if not submitted:
+            logger.warning("No URLs to process!")
+            return ""
+        
+        while pending and not assembler.full:
+            collect(timeout=None)
+    finally:
+        if pending:
+            # The budget is met or the link producer failed; release the sockets
+            # and workers of the remaining sources
+            logger.info(f"Cancelling {len(pending)} outstanding sources")
+            for future in pending:
+                future.cancel()
     
-    # Create directory if it doesn't exist
-    os.makedirs(os.path.dirname(output_txt_path) if os.path.dirname(output_txt_path) else ".", exist_ok=True)
+    limited_text = assembler.text()
     
-    # Write to output file
-    with open(output_txt_path, 'w', encoding='utf-8') as out_file:
-        out_file.write(limited_text)
+    # Optional side-output
+    if output_txt_path:
+        write_text_file(output_txt_path, limited_text)
     
     # Log the results
-    source_count = len([t for t in all_text if t.startswith("Source:")])
-    logger.info(f"Scraped content from {source_count} valid sources and saved to {output_txt_path}")
+    logger.info(f"Scraped content from {assembler.sources} valid sources ({assembler.duplicates} near-duplicates dropped)")
     logger.info(f"Content length: {len(limited_text)} chars (limited to {char_limit})")
     
     return limited_text
@@ -181,7 +300,7 @@ if __name__ == "__main__":
     parser.add_argument("--csv", "-c", required=True, help="Path to CSV file with URLs")
     parser.add_argument("--output", "-o", help="Output text file path")
     parser.add_argument("--max-urls", "-m", type=int, help=f"Maximum URLs to scrape (default: {Config.MAX_URLS_TO_SCRAPE})")
-    parser.add_argument("--char-limit", "-l", type=int, help=f"Character limit for output (default: {Config.MAX_CHARACTERS_IN_SUMMARY})")
+    parser.add_argument("--char-limit", "-l", type=int, help="Character limit for output (default: the LLM context budget)")
     
     # Parse arguments
     args = parser.parse_args()
@@ -196,5 +315,8 @@ if __name__ == "__main__":
     # Run scraper
     logger.info(f"Scraping content from URLs in {args.csv}")
     content = scrape_first_urls(args.csv, args.output, args.max_urls, args.char_limit)
+    shutdown_page_fetcher()
+    shutdown_parse_pool()
+    close_url_cache()
     
     logger.info(f"Scraping complete. Content saved to {args.output}")
\ No newline at end of file
@@ -0,0 +1,143 @@
+"""
+Batched selector probing for the Google Lens UI.
+
+All candidate selectors are evaluated inside the page in a single execute_script
+call, which returns the first visible, enabled match and the strategy that won.
+This replaces one WebDriverWait round trip per selector.
+"""
+import json
+import logging
+import time
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+
+class Candidate:
+    """One way of locating an element: a CSS selector, an XPath, or a CSS selector plus required text"""
+    __slots__ = ("strategy", "selector", "text", "visible")
+
+    def __init__(self, strategy, selector, text=None, visible=True):
+        self.strategy = strategy
+        self.selector = selector
+        self.text = text.lower() if text else None
+        self.visible = visible
+
+    @property
+    def key(self):
+        """Stable identifier for logging and statistics"""
+        if self.text:
+            return f"{self.strategy}:{self.selector}:{self.text}"
+        return f"{self.strategy}:{self.selector}"
+
+    def to_js(self):
+        return {"strategy": self.strategy, "selector": self.selector, "text": self.text, "visible": self.visible}
+
+    def __repr__(self):
+        return f"Candidate({self.key})"
+
+
+def css(selector, visible=True):
+    return Candidate("css", selector, visible=visible)
+
+
+def xpath(selector, visible=True):
+    return Candidate("xpath", selector, visible=visible)
+
+
+def contains_text(selector, needle, visible=True):
+    """Elements matching the CSS selector whose text contains needle (case-insensitive)"""
+    return Candidate("text", selector, text=needle, visible=visible)
+
+
+class ProbeResult:
+    """The element a probe found and which candidate matched it"""
+    __slots__ = ("element", "candidate", "index", "checked", "elapsed_ms")
+
+    def __init__(self, element, candidate, index, checked, elapsed_ms):
+        self.element = element
+        self.candidate = candidate
+        self.index = index        # position of the winning candidate in the probed list
+        self.checked = checked    # how many candidates the page evaluated
+        self.elapsed_ms = elapsed_ms
+
+
+# Body of a function that returns {index, element, checked} for the first match, or null
+_PROBE_BODY = """
+    const candidates = %s;
+
+    function isVisible(el) {
+        if (!el.getClientRects().length) return false;
+        const rect = el.getBoundingClientRect();
+        if (rect.width === 0 || rect.height === 0) return false;
+        const style = window.getComputedStyle(el);
+        return style.visibility !== 'hidden' && style.display !== 'none';
+    }
+
+    function isEnabled(el) {
+        return !el.disabled && el.getAttribute('aria-disabled') !== 'true';
+    }
+
+    function nodesFor(c) {
+        if (c.strategy === 'xpath') {
+            const snapshot = document.evaluate(c.selector, document, null,
+                XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+            const nodes = [];
+            for (let i = 0; i < snapshot.snapshotLength; i++) nodes.push(snapshot.snapshotItem(i));
+            return nodes;
+        }
+        const nodes = Array.from(document.querySelectorAll(c.selector));
+        if (c.strategy === 'text') {
+            return nodes.filter(el => (el.textContent || '').toLowerCase().includes(c.text));
+        }
+        return nodes;
+    }
+
+    for (let i = 0; i < candidates.length; i++) {
+        const c = candidates[i];
+        let nodes;
+        try {
+            nodes = nodesFor(c);
+        } catch (e) {
+            continue;  // Invalid selector for this browser, skip it
+        }
+        for (const el of nodes) {
+            if (el.nodeType !== Node.ELEMENT_NODE) continue;
+            if (!c.visible || (isVisible(el) && isEnabled(el))) {
+                return {index: i, element: el, checked: i + 1};
+            }
+        }
+    }
+    return null;
+"""
+
+
+def probe_script(candidates):
+    """Function body usable with execute_script or as a WaitEngine condition"""
+    return _PROBE_BODY % json.dumps([c.to_js() for c in candidates])
+
+
+def _to_result(match, candidates, label, elapsed_ms):
+    if not match:
+        logger.info(f"Probe '{label}' found no match among {len(candidates)} candidates in {elapsed_ms:.1f} ms")
+        return None
+    candidate = candidates[match["index"]]
+    logger.info(f"Probe '{label}' matched {candidate.key} "
+                f"({match['index'] + 1}/{len(candidates)}) in {elapsed_ms:.1f} ms")
+    return ProbeResult(match["element"], candidate, match["index"], match["checked"], elapsed_ms)
+
+
+def probe_selectors(driver, candidates, label="probe"):
+    """Evaluate every candidate in one round trip and return a ProbeResult, or None"""
+    start = time.perf_counter()
+    match = driver.execute_script(probe_script(candidates))
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    return _to_result(match, candidates, label, elapsed_ms)
+
+
+def wait_for_probe(waits, phase, candidates, label=None, timeout=None):
+    """Like probe_selectors, but keep re-probing on DOM changes until a match or the phase bound"""
+    start = time.perf_counter()
+    match = waits.until(phase, probe_script(candidates), timeout=timeout)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    return _to_result(match, candidates, label or phase, elapsed_ms)
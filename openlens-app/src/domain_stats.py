@@ -0,0 +1,186 @@
+"""
+Per-domain fetch statistics, adaptive timeouts and a circuit breaker.
+
+Every page fetch is recorded against its host: a rolling window of recent
+outcomes gives the success rate and latency percentiles. Once a host has enough
+samples its timeout becomes a multiple of its p95 latency (clamped between
+DOMAIN_TIMEOUT_MIN and FETCH_TIMEOUT), so a slow host no longer costs the full
+timeout on every request. A host that fails CIRCUIT_FAILURE_THRESHOLD times in a
+row is skipped for CIRCUIT_COOLDOWN seconds; after that a single probe request
+is let through and its outcome closes or reopens the breaker.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from urllib.parse import urlparse
+from config import Config
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+_domain_stats = None
+_domain_stats_lock = threading.Lock()
+
+
+def host_of(url):
+    return urlparse(url).netloc
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class _Domain:
+    __slots__ = ("outcomes", "requests", "failures", "consecutive_failures", "text_chars", "texts",
+                 "skipped", "open_until", "probe_started")
+
+    def __init__(self, window):
+        self.outcomes = deque(maxlen=window)  # (ok, elapsed_ms)
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.text_chars = 0
+        self.texts = 0
+        self.skipped = 0
+        self.open_until = 0.0    # breaker is open until this time
+        self.probe_started = 0.0  # a half-open probe is in flight since this time
+
+    def latencies(self):
+        return [elapsed_ms for ok, elapsed_ms in self.outcomes if ok]
+
+
+class DomainStats:
+    """Rolling per-host outcomes that drive fetch timeouts and host skipping"""
+
+    def __init__(self, window, min_samples, timeout_multiplier, min_timeout, max_timeout,
+                 failure_threshold, cooldown, max_domains):
+        self.window = window
+        self.min_samples = min_samples
+        self.timeout_multiplier = timeout_multiplier
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_domains = max_domains
+        self._domains = OrderedDict()  # host -> _Domain, least recently used first
+        self._lock = threading.Lock()
+
+    def _domain(self, host):
+        domain = self._domains.get(host)
+        if domain is None:
+            domain = self._domains[host] = _Domain(self.window)
+            while len(self._domains) > self.max_domains:
+                self._domains.popitem(last=False)
+        else:
+            self._domains.move_to_end(host)
+        return domain
+
+    def _timeout(self, domain):
+        latencies = domain.latencies()
+        if len(latencies) < self.min_samples:
+            return self.max_timeout
+        timeout = _percentile(latencies, 0.95) / 1000 * self.timeout_multiplier
+        return max(self.min_timeout, min(self.max_timeout, timeout))
+
+    def timeout(self, host):
+        """Seconds to allow a fetch from host"""
+        with self._lock:
+            domain = self._domains.get(host)
+            return self._timeout(domain) if domain else self.max_timeout
+
+    def allow(self, host):
+        """False while host's breaker is open; after the cool-down one probe is allowed through"""
+        now = time.time()
+        with self._lock:
+            domain = self._domains.get(host)
+            if domain is None or not domain.open_until:
+                return True
+            # A probe that never reported back (e.g. cancelled) does not block the host forever
+            probing = now - domain.probe_started < self.max_timeout
+            if now < domain.open_until or probing:
+                domain.skipped += 1
+                return False
+            domain.probe_started = now
+            return True
+
+    def record_success(self, host, elapsed_ms):
+        """host answered (even with a client error like 404)"""
+        with self._lock:
+            domain = self._domain(host)
+            domain.requests += 1
+            domain.outcomes.append((True, elapsed_ms))
+            domain.consecutive_failures = 0
+            if domain.open_until:
+                logger.info(f"Circuit for {host} closed")
+            domain.open_until = 0.0
+            domain.probe_started = 0.0
+
+    def record_failure(self, host, elapsed_ms):
+        """host timed out, refused the connection, blocked us or returned a server error"""
+        now = time.time()
+        with self._lock:
+            domain = self._domain(host)
+            domain.requests += 1
+            domain.failures += 1
+            domain.outcomes.append((False, elapsed_ms))
+            domain.consecutive_failures += 1
+            domain.probe_started = 0.0
+            if domain.open_until or domain.consecutive_failures >= self.failure_threshold:
+                domain.open_until = now + self.cooldown
+                logger.warning(
+                    f"Circuit for {host} open for {self.cooldown}s after "
+                    f"{domain.consecutive_failures} consecutive failures"
+                )
+
+    def record_text(self, host, chars):
+        """Characters of useful text a page from host produced"""
+        with self._lock:
+            domain = self._domain(host)
+            domain.texts += 1
+            domain.text_chars += chars
+
+    def snapshot(self):
+        now = time.time()
+        with self._lock:
+            snapshot = {}
+            for host, domain in self._domains.items():
+                latencies = domain.latencies()
+                recent_ok = sum(1 for ok, _ in domain.outcomes if ok)
+                if domain.open_until and now < domain.open_until:
+                    state = "open"
+                elif domain.open_until:
+                    state = "half-open"
+                else:
+                    state = "closed"
+                snapshot[host] = {
+                    "requests": domain.requests,
+                    "failures": domain.failures,
+                    "success_rate": round(recent_ok / len(domain.outcomes), 3) if domain.outcomes else None,
+                    "p50_ms": round(_percentile(latencies, 0.5), 1) if latencies else None,
+                    "p95_ms": round(_percentile(latencies, 0.95), 1) if latencies else None,
+                    "timeout": round(self._timeout(domain), 2),
+                    "avg_text_chars": round(domain.text_chars / domain.texts) if domain.texts else 0,
+                    "circuit": state,
+                    "skipped": domain.skipped,
+                }
+            return snapshot
+
+
+def get_domain_stats():
+    """Return the process-wide domain statistics"""
+    global _domain_stats
+    with _domain_stats_lock:
+        if _domain_stats is None:
+            _domain_stats = DomainStats(
+                window=Config.DOMAIN_STATS_WINDOW,
+                min_samples=Config.DOMAIN_TIMEOUT_MIN_SAMPLES,
+                timeout_multiplier=Config.DOMAIN_TIMEOUT_MULTIPLIER,
+                min_timeout=Config.DOMAIN_TIMEOUT_MIN,
+                max_timeout=Config.FETCH_TIMEOUT,
+                failure_threshold=Config.CIRCUIT_FAILURE_THRESHOLD,
+                cooldown=Config.CIRCUIT_COOLDOWN,
+                max_domains=Config.DOMAIN_STATS_MAX_DOMAINS,
+            )
+        return _domain_stats
@@ -0,0 +1,181 @@
+"""
+Process-wide pool of warm Selenium WebDrivers for the Google Lens scraper
+"""
+import logging
+import threading
+import time
+from collections import deque
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+
+class PooledDriver:
+    """A WebDriver together with the bookkeeping used to decide when to recycle it"""
+    __slots__ = ("driver", "created_at", "uses")
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.created_at = time.monotonic()
+        self.uses = 0
+
+    @property
+    def age(self):
+        return time.monotonic() - self.created_at
+
+
+class DriverPool:
+    """Hand out warm, health-checked drivers and recycle them after max_uses or max_age"""
+
+    def __init__(self, factory, size, max_uses, max_age, acquire_timeout):
+        self._factory = factory
+        self._size = max(1, size)
+        self._max_uses = max_uses
+        self._max_age = max_age
+        self._acquire_timeout = acquire_timeout
+        self._idle = deque()
+        self._total = 0  # idle + leased + being created
+        self._closed = False
+        self._cond = threading.Condition()
+        self._stats = {"created": 0, "reused": 0, "retired": 0, "unhealthy": 0}
+
+    def _is_expired(self, pooled):
+        if self._max_uses and pooled.uses >= self._max_uses:
+            return True
+        if self._max_age and pooled.age >= self._max_age:
+            return True
+        return False
+
+    def _is_healthy(self, pooled):
+        """Cheap liveness probe: the chromedriver process is up and the browser answers"""
+        driver = pooled.driver
+        try:
+            process = getattr(getattr(driver, "service", None), "process", None)
+            if process is not None and process.poll() is not None:
+                return False
+            driver.execute_script("return 1")
+            driver.window_handles  # Fails if the browser window has gone away
+            return True
+        except Exception as e:
+            logger.warning(f"Pooled driver failed health check: {e}")
+            return False
+
+    def _retire(self, pooled, reason):
+        logger.info(f"Retiring driver after {pooled.uses} uses, {pooled.age:.0f}s ({reason})")
+        try:
+            pooled.driver.quit()
+        except Exception as e:
+            logger.debug(f"Error quitting retired driver: {e}")
+
+    def acquire(self):
+        """Return a healthy PooledDriver, creating one if the pool has room"""
+        deadline = time.monotonic() + self._acquire_timeout
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise RuntimeError("Driver pool is closed")
+                candidate = self._idle.popleft() if self._idle else None
+                if candidate is None:
+                    if self._total < self._size:
+                        self._total += 1
+                        create = True
+                    else:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise TimeoutError(f"No browser available after {self._acquire_timeout}s")
+                        self._cond.wait(remaining)
+                        continue
+                else:
+                    create = False
+
+            if create:
+                try:
+                    pooled = PooledDriver(self._factory())
+                except Exception:
+                    self._release_slot()
+                    raise
+                with self._cond:
+                    self._stats["created"] += 1
+                pooled.uses += 1
+                return pooled
+
+            # Validate idle drivers outside the lock, health checks talk to the browser
+            if self._is_expired(candidate):
+                self._retire(candidate, "expired")
+                with self._cond:
+                    self._stats["retired"] += 1
+                self._release_slot()
+                continue
+            if not self._is_healthy(candidate):
+                self._retire(candidate, "unhealthy")
+                with self._cond:
+                    self._stats["unhealthy"] += 1
+                self._release_slot()
+                continue
+            with self._cond:
+                self._stats["reused"] += 1
+            candidate.uses += 1
+            return candidate
+
+    def release(self, pooled, discard=False):
+        """Return a driver to the pool, or quit it if discarded, expired or the pool is closed"""
+        if not discard and not self._closed and not self._is_expired(pooled):
+            try:
+                # Leave the browser on a blank page so idle drivers hold no page state
+                pooled.driver.get("about:blank")
+            except Exception as e:
+                logger.warning(f"Could not reset driver, discarding it: {e}")
+                discard = True
+            else:
+                with self._cond:
+                    if not self._closed:
+                        self._idle.append(pooled)
+                        self._cond.notify()
+                        return
+
+        self._retire(pooled, "discarded" if discard else "expired")
+        with self._cond:
+            self._stats["retired"] += 1
+        self._release_slot()
+
+    def _release_slot(self):
+        with self._cond:
+            self._total -= 1
+            self._cond.notify()
+
+    def warm(self, count=None):
+        """Start up to count drivers ahead of time so the first requests skip Chrome startup"""
+        count = self._size if count is None else min(count, self._size)
+        started = []
+        try:
+            for _ in range(count):
+                with self._cond:
+                    if self._total >= self._size or self._closed:
+                        break
+                started.append(self.acquire())
+        except Exception as e:
+            logger.error(f"Error warming driver pool: {e}")
+        for pooled in started:
+            pooled.uses -= 1  # Warming is not a real use
+            self.release(pooled)
+        logger.info(f"Driver pool warmed with {len(started)} browser(s)")
+
+    def stats(self):
+        with self._cond:
+            return {
+                "size": self._size,
+                "total": self._total,
+                "idle": len(self._idle),
+                **self._stats,
+            }
+
+    def close(self):
+        """Quit every idle driver; leased drivers are quit when they are released"""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._cond.notify_all()
+        for pooled in idle:
+            self._retire(pooled, "pool closed")
+            self._release_slot()
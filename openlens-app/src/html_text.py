@@ -0,0 +1,164 @@
+"""
+HTML-to-text extraction backends.
+
+All backends implement the same rules as the original BeautifulSoup code: drop
+script, style, header, footer and nav elements (and comments), join the remaining
+text nodes with spaces and collapse whitespace. html.parser is always available;
+lxml and selectolax are used when installed and are several times faster.
+"""
+import functools
+import logging
+import os
+import re
+from bs4 import BeautifulSoup
+from structured_data import extract_product, format_product
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+REMOVED_TAGS = ['script', 'style', 'header', 'footer', 'nav']
+
+# Preferred order for the "auto" backend
+AUTO_ORDER = ['selectolax', 'lxml', 'html.parser']
+
+_META_CHARSET = re.compile(rb'<meta[^>]+charset=["\']?([a-zA-Z0-9_\-]+)', re.IGNORECASE)
+
+
+def detect_charset(body, charset=None):
+    """Charset from the HTTP header, else from a <meta> tag near the top, else utf-8"""
+    if charset:
+        return charset
+    match = _META_CHARSET.search(body[:4096])
+    return match.group(1).decode('ascii') if match else 'utf-8'
+
+
+def decode_html(body, charset=None):
+    if isinstance(body, str):
+        return body
+    encoding = detect_charset(body, charset)
+    try:
+        return body.decode(encoding, errors='replace')
+    except LookupError:
+        return body.decode('utf-8', errors='replace')
+
+
+def normalize_whitespace(text):
+    return ' '.join(text.split())
+
+
+def html_parser_text(body, charset=None):
+    """Reference implementation: BeautifulSoup with the stdlib html.parser"""
+    # Parse with BeautifulSoup
+    soup = BeautifulSoup(body, 'html.parser', from_encoding=charset if isinstance(body, bytes) else None)
+
+    # Remove script and style tags
+    for script_or_style in soup(REMOVED_TAGS):
+        script_or_style.decompose()
+
+    # Get text and clean it up
+    return normalize_whitespace(soup.get_text(separator=' ', strip=True))
+
+
+def _lxml_chunks(root):
+    """Text nodes under root in document order, skipping removed elements and comments.
+
+    A removed element's tail stays a separate chunk, so 'Price:<script/>$5'
+    reads 'Price: $5' as with the other backends.
+    """
+    chunks = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, str):
+            chunks.append(node)
+            continue
+        if not isinstance(node.tag, str) or node.tag in REMOVED_TAGS:
+            continue  # Comment, processing instruction or removed element
+        if node.text:
+            chunks.append(node.text)
+        for child in reversed(node):
+            if child.tail:
+                stack.append(child.tail)
+            stack.append(child)
+    return chunks
+
+
+def lxml_text(body, charset=None):
+    import lxml.html
+    from lxml import etree
+    # Decode with Python's codecs (libxml2 knows fewer charset names), then hand lxml UTF-8
+    parser = lxml.html.HTMLParser(encoding='utf-8')
+    try:
+        doc = lxml.html.document_fromstring(decode_html(body, charset).encode('utf-8'), parser=parser)
+    except etree.ParserError:
+        return ""  # Empty document
+    return normalize_whitespace(' '.join(_lxml_chunks(doc)))
+
+
+def selectolax_text(body, charset=None):
+    from selectolax.lexbor import LexborHTMLParser
+    tree = LexborHTMLParser(decode_html(body, charset))
+    tree.strip_tags(REMOVED_TAGS)
+    if tree.root is None:
+        return ""
+    return normalize_whitespace(tree.root.text(separator=' ', strip=True))
+
+
+BACKENDS = {
+    'html.parser': html_parser_text,
+    'lxml': lxml_text,
+    'selectolax': selectolax_text,
+}
+
+_MODULES = {'lxml': 'lxml.html', 'selectolax': 'selectolax.lexbor'}
+
+
+def available_backends():
+    """Names of the backends whose libraries are installed"""
+    names = []
+    for name in BACKENDS:
+        module = _MODULES.get(name)
+        if module:
+            try:
+                __import__(module)
+            except ImportError:
+                continue
+        names.append(name)
+    return names
+
+
+@functools.lru_cache(maxsize=None)
+def get_backend(name='auto'):
+    """Return the extraction function for name ('auto' picks the fastest installed)"""
+    available = available_backends()
+    if name == 'auto':
+        name = next(candidate for candidate in AUTO_ORDER if candidate in available)
+    elif name not in available:
+        logger.warning(f"HTML backend {name} is not available, falling back to html.parser")
+        name = 'html.parser'
+    return BACKENDS[name]
+
+
+def extract_text(body, charset=None, backend='auto', structured=False):
+    """Extract normalized plain text from an HTML document (bytes or str).
+
+    With structured, a page that carries JSON-LD/OpenGraph product data yields a
+    compact product record instead and its body is not parsed at all.
+    """
+    if structured:
+        encoding = 'utf-8' if isinstance(body, str) else detect_charset(body, charset)
+        product = extract_product(body, encoding)
+        if product is not None:
+            return format_product(product)
+    return get_backend(backend)(body, charset)
+
+
+def extract_excerpt(body, charset, backend, char_limit, structured=False):
+    """Parser worker entry point: text of a page cut to char_limit characters"""
+    return extract_text(body, charset, backend, structured)[:char_limit]
+
+
+def warm_worker(backend):
+    """Import the backend's parser library in a worker process; returns the worker's pid"""
+    get_backend(backend)
+    return os.getpid()
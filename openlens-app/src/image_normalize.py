@@ -0,0 +1,75 @@
+"""
+Image preprocessing before the Lens upload.
+
+Phone photos arrive as multi-megapixel files in whatever format the client used.
+Lens does not need that resolution, so images are validated from their header,
+decoded at reduced size where the format allows it, rotated upright, downscaled
+to a maximum edge and re-encoded as JPEG without EXIF metadata.
+"""
+import logging
+import os
+import time
+from PIL import Image, ImageOps, UnidentifiedImageError
+from config import Config
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+
+class InvalidImage(Exception):
+    """The uploaded bytes are not a decodable image"""
+
+
+def probe_image(fileobj):
+    """Read only the image header; returns (format, (width, height)) or raises InvalidImage"""
+    try:
+        with Image.open(fileobj) as img:
+            return img.format, img.size
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        raise InvalidImage(f"Not a supported image: {e}")
+
+
+def normalize_image(fileobj, output_path, max_edge=None, quality=None):
+    """Downscale, strip metadata and re-encode an image as JPEG at output_path.
+
+    Returns a dict with the input/output sizes and the time taken.
+    """
+    if max_edge is None:
+        max_edge = Config.IMAGE_MAX_EDGE
+    if quality is None:
+        quality = Config.IMAGE_JPEG_QUALITY
+
+    start = time.perf_counter()
+    try:
+        with Image.open(fileobj) as img:
+            source_format, source_size = img.format, img.size
+            # JPEGs can be decoded directly at a fraction of their size
+            img.draft("RGB", (max_edge, max_edge))
+            img = ImageOps.exif_transpose(img)
+            if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+                # Flatten transparency onto white rather than black
+                rgba = img.convert("RGBA")
+                img = Image.new("RGB", rgba.size, (255, 255, 255))
+                img.paste(rgba, mask=rgba.getchannel("A"))
+            elif img.mode != "RGB":
+                img = img.convert("RGB")
+            img.thumbnail((max_edge, max_edge), Image.LANCZOS)
+            # Saving without exif= drops the metadata
+            img.save(output_path, "JPEG", quality=quality, optimize=True)
+            output_size = img.size
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        # A truncated or corrupt file can pass the header probe and only fail here
+        raise InvalidImage(f"Not a supported image: {e}")
+
+    stats = {
+        "format": source_format,
+        "source_size": source_size,
+        "output_size": output_size,
+        "output_bytes": os.path.getsize(output_path),
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+    }
+    logger.info(
+        f"Normalized {source_format} {source_size[0]}x{source_size[1]} to "
+        f"{output_size[0]}x{output_size[1]} JPEG ({stats['output_bytes']} bytes) in {stats['elapsed_ms']}ms"
+    )
+    return stats
@@ -0,0 +1,122 @@
+"""
+Size-capped buffer for incoming images.
+
+Uploads are written chunk by chunk into a SpooledTemporaryFile: small images stay
+in memory, larger ones roll over to disk, and anything above the cap is rejected
+as soon as it crosses it instead of after the whole body has been read.
+"""
+import base64
+import binascii
+import hashlib
+import logging
+import shutil
+import tempfile
+from config import Config
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+
+class ImageTooLarge(Exception):
+    """The image exceeds the configured size cap"""
+
+
+class ImageFetchError(Exception):
+    """The image URL did not return an image"""
+
+
+def is_image_content_type(content_type):
+    content_type = content_type.split(";")[0].strip().lower()
+    return content_type.startswith("image/") or content_type in ("application/octet-stream", "binary/octet-stream")
+
+
+class ImageSink:
+    """Spooled, size-capped file holding one image until the pipeline saves it"""
+
+    def __init__(self, max_bytes=None, spool_bytes=None):
+        self.max_bytes = Config.MAX_IMAGE_BYTES if max_bytes is None else max_bytes
+        spool_bytes = Config.IMAGE_SPOOL_BYTES if spool_bytes is None else spool_bytes
+        self._file = tempfile.SpooledTemporaryFile(max_size=spool_bytes)
+        self._sha256 = hashlib.sha256()
+        self.size = 0
+
+    def write(self, chunk):
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise ImageTooLarge(f"Image exceeds the {self.max_bytes} byte limit")
+        self._file.write(chunk)
+        self._sha256.update(chunk)
+
+    @property
+    def digest(self):
+        """SHA-256 (hex) of the bytes written so far"""
+        return self._sha256.hexdigest()
+
+    def copy_from(self, fileobj):
+        """Copy a file-like object into the sink, enforcing the cap as it goes"""
+        while True:
+            chunk = fileobj.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            self.write(chunk)
+
+    def reader(self):
+        """Rewind and return the buffered file for reading"""
+        self._file.seek(0)
+        return self._file
+
+    def save(self, path):
+        """Write the buffered image to path"""
+        self._file.seek(0)
+        with open(path, "wb") as out_file:
+            shutil.copyfileobj(self._file, out_file, CHUNK_SIZE)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @classmethod
+    def from_base64(cls, image_base64, max_bytes=None):
+        """Decode a base64 image into a new sink; raises ValueError if it is not valid base64"""
+        sink = cls(max_bytes)
+        try:
+            sink.write(base64.b64decode(image_base64))
+        except binascii.Error as e:
+            sink.close()
+            raise ValueError(f"Invalid base64 image: {e}")
+        except BaseException:
+            sink.close()
+            raise
+        return sink
+
+
+async def fetch_image(client, url, max_bytes=None):
+    """Stream an image from url into a new sink using a shared httpx.AsyncClient.
+
+    Raises httpx.HTTPError for transport or status errors, ImageFetchError for a
+    non-image content type and ImageTooLarge as soon as the cap is exceeded.
+    """
+    sink = ImageSink(max_bytes)
+    try:
+        async with client.stream("GET", url) as response:
+            response.raise_for_status()
+            content_type = response.headers.get("content-type", "")
+            if not is_image_content_type(content_type):
+                raise ImageFetchError(f"URL returned {content_type or 'no content type'}, not an image")
+            declared = response.headers.get("content-length", "")
+            if declared.isdigit() and int(declared) > sink.max_bytes:
+                raise ImageTooLarge(f"Image exceeds the {sink.max_bytes} byte limit")
+            async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                sink.write(chunk)
+        logger.info(f"Fetched {sink.size} byte image ({content_type}) from {url[:100]}")
+    except BaseException:
+        sink.close()
+        raise
+    return sink
@@ -0,0 +1,142 @@
+"""
+In-process asynchronous job queue for long-running analyses.
+
+Clients submit work and poll for the result instead of holding an HTTP
+connection open for the whole pipeline. A bounded asyncio queue feeds a fixed
+number of worker tasks; finished jobs are kept for a TTL and then discarded.
+"""
+import asyncio
+import logging
+import time
+import uuid
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class Job:
+    """State of one submitted analysis"""
+    __slots__ = ("id", "payload", "status", "created_at", "started_at", "finished_at", "result", "error")
+
+    def __init__(self, payload):
+        self.id = str(uuid.uuid4())
+        self.payload = payload
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+
+    @property
+    def done(self):
+        return self.status in (SUCCEEDED, FAILED)
+
+    def to_dict(self):
+        data = {
+            "job_id": self.id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if self.status == SUCCEEDED:
+            data["result"] = self.result
+        elif self.status == FAILED:
+            data["error"] = self.error
+        return data
+
+
+class JobQueue:
+    """Bounded queue of jobs processed by a pool of asyncio worker tasks"""
+
+    def __init__(self, handler, workers, max_queue, result_ttl):
+        self._handler = handler  # async callable(payload) -> result dict
+        self._workers = workers
+        self._max_queue = max_queue
+        self._result_ttl = result_ttl
+        self._queue = None
+        self._jobs = {}
+        self._tasks = []
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self._max_queue)
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self._workers)]
+        logger.info(f"Job queue started with {self._workers} workers (max queue {self._max_queue})")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, payload):
+        """Queue a job; raises asyncio.QueueFull when the queue is at capacity"""
+        self._purge_expired()
+        job = Job(payload)
+        self._queue.put_nowait(job)
+        self._jobs[job.id] = job
+        logger.info(f"Queued job {job.id} (depth {self._queue.qsize()})")
+        return job
+
+    def get(self, job_id):
+        self._purge_expired()
+        return self._jobs.get(job_id)
+
+    def position(self, job):
+        """1-based position of a queued job, or 0 if it is no longer waiting"""
+        if job.status != QUEUED:
+            return 0
+        waiting = [j for j in self._jobs.values() if j.status == QUEUED]
+        waiting.sort(key=lambda j: j.created_at)
+        return waiting.index(job) + 1
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "running": self._running,
+            "workers": self._workers,
+            "max_queue": self._max_queue,
+            "completed": self._completed,
+            "failed": self._failed,
+            "retained": sum(1 for job in self._jobs.values() if job.done),
+        }
+
+    def _purge_expired(self):
+        cutoff = time.time() - self._result_ttl
+        expired = [job_id for job_id, job in self._jobs.items() if job.done and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    async def _worker(self, index):
+        while True:
+            job = await self._queue.get()
+            job.status = RUNNING
+            job.started_at = time.time()
+            self._running += 1
+            try:
+                job.result = await self._handler(job.payload)
+                job.status = SUCCEEDED
+                self._completed += 1
+            except asyncio.CancelledError:
+                job.status = FAILED
+                job.error = "Job cancelled during shutdown"
+                raise
+            except Exception as e:
+                job.status = FAILED
+                job.error = getattr(e, "detail", None) or str(e)
+                self._failed += 1
+                logger.error(f"Job {job.id} failed: {job.error}")
+            finally:
+                job.finished_at = time.time()
+                job.payload = None  # Release the image data
+                self._running -= 1
+                self._queue.task_done()
@@ -1,14 +1,22 @@
 import os
+import time
 from openai import OpenAI
 import logging
 import argparse
 from config import Config
+from stage_cache import content_key, get_stage_cache
+from token_budget import context_budget, count_tokens, truncate_tokens
 
 # Setup logging
 logger = logging.getLogger(__name__)
 
-def get_llm_analysis(content, system_prompt=None, base_url=None, model=None, temperature=None, api_key=None):
-    """Process the text content through OpenAI API with robust error handling and fallbacks"""
+def get_llm_analysis(content, system_prompt=None, base_url=None, model=None, temperature=None, api_key=None, on_token=None):
+    """Process the text content through OpenAI API with robust error handling and fallbacks
+
+    If on_token is given the completion is streamed and on_token(text) is called for
+    each fragment as it arrives; the full text is still returned at the end. Fragments
+    from a failed attempt are not retracted, so the return value is authoritative.
+    """
     # Use default system prompt if not provided
     if system_prompt is None:
         system_prompt = Config.SYSTEM_PROMPT
@@ -44,6 +52,15 @@ def get_llm_analysis(content, system_prompt=None, base_url=None, model=None, tem
         logger.error("No content to analyze! Returning error message.")
         return "Unable to analyze content: No text was scraped from Google Lens search results. This may be due to Google's anti-bot measures or network connectivity issues."
     
+    # Reuse an earlier answer for the same text, model and prompt
+    cache = get_stage_cache()
+    cache_key = content_key(model, temperature, Config.MAX_TOKENS, system_prompt, content)
+    cached = cache.get("llm", cache_key)
+    if cached is not None:
+        if on_token is not None:
+            on_token(cached)
+        return cached
+    
     # Initialize variables for retry logic
     max_retries = 3
     retry_count = 0
@@ -75,8 +92,10 @@ def get_llm_analysis(content, system_prompt=None, base_url=None, model=None, tem
             logger.info(f"Using model: {current_model}")
             logger.info(f"Base URL: {base_url}")
             
-            # Truncate content if needed
-            truncated_content = content[:min(len(content), 20000)]
+            # Trim the content to what fits next to the prompt and the answer
+            budget = context_budget(current_model, system_prompt)
+            truncated_content = truncate_tokens(content, budget.content_tokens, current_model)
+            logger.info(f"Content: {count_tokens(truncated_content, current_model)} tokens (budget {budget.content_tokens})")
             
             response = client.chat.completions.create(
                 model=current_model,
@@ -86,14 +105,26 @@ def get_llm_analysis(content, system_prompt=None, base_url=None, model=None, tem
                 ],
                 temperature=temperature,
                 max_tokens=Config.MAX_TOKENS,
-                timeout=Config.API_TIMEOUT
+                timeout=Config.API_TIMEOUT,
+                stream=on_token is not None
             )
             
             # Extract the response text
-            result = response.choices[0].message.content
+            if on_token is None:
+                result = response.choices[0].message.content
+            else:
+                parts = []
+                for chunk in response:
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        parts.append(delta)
+                        on_token(delta)
+                result = "".join(parts)
             
             logger.info(f"Received {len(result)} chars response from OpenAI")
             logger.info(f"OpenAI response preview: {result[:100]}...")
+            if current_model == model:
+                cache.put("llm", cache_key, result)
             return result
             
         except Exception as e:
@@ -1,13 +1,32 @@
-from fastapi import BackgroundTasks, FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-import base64
+from typing import Optional
+import asyncio
+import httpx
+import json
 import os
 import uuid
-import requests
-from selenium_lens_scraper import run_google_lens_search
-from bs4_small_scraper import scrape_first_urls
+import threading
+from contextlib import closing
+from selenium_lens_scraper import stream_google_lens_search, LensSearchError, get_driver_pool, shutdown_driver_pool
+from selector_stats import get_selector_stats
+from bs4_small_scraper import scrape_links
+from page_fetcher import get_page_fetcher, shutdown_page_fetcher
+from parse_pool import shutdown_parse_pool, warm_parse_pool
+from url_cache import close_url_cache, get_url_cache
+from domain_stats import get_domain_stats
+from token_budget import context_budget
+from stages import Channel, get_stage_executors, shutdown_stage_executors
 from llm_analysis import get_llm_analysis
+from jobs import JobQueue
+from results import LensResult
+from stage_cache import close_stage_cache, content_key, get_stage_cache
+from perceptual_index import dhash, get_perceptual_index, is_distinctive
+from singleflight import SingleFlight
+from image_normalize import InvalidImage, normalize_image, probe_image
+from image_sink import ImageFetchError, ImageSink, ImageTooLarge, fetch_image, is_image_content_type
 import logging
 from config import Config
 
@@ -24,7 +43,8 @@ logger.info(f"Image directory: {Config.IMAGE_DIR}")
 logger.info(f"CSV directory: {Config.CSV_DIR}")
 logger.info(f"TXT directory: {Config.TXT_DIR}")
 logger.info(f"Max URLs to scrape: {Config.MAX_URLS_TO_SCRAPE}")
-logger.info(f"Max characters in summary: {Config.MAX_CHARACTERS_IN_SUMMARY}")
+logger.info(f"Max input tokens: {Config.MAX_INPUT_TOKENS}")
+logger.info(f"Browser pool size: {Config.DRIVER_POOL_SIZE}")
 
 # Create necessary directories
 Config.create_dirs()
@@ -40,12 +60,62 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
+job_queue = None
+http_client = None
+in_flight = SingleFlight()
+
+@app.on_event("startup")
+async def startup():
+    global job_queue, http_client
+    # Shared, pooled client for fetching images by URL
+    http_client = httpx.AsyncClient(
+        headers={'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'},
+        timeout=httpx.Timeout(Config.IMAGE_FETCH_TIMEOUT),
+        limits=httpx.Limits(max_connections=Config.IMAGE_FETCH_MAX_CONNECTIONS),
+        follow_redirects=True,
+    )
+    job_queue = JobQueue(
+        handler=_run_job,
+        workers=Config.JOB_WORKERS,
+        max_queue=Config.JOB_QUEUE_SIZE,
+        result_ttl=Config.JOB_RESULT_TTL,
+    )
+    await job_queue.start()
+    if Config.PHASH_ENABLED:
+        await asyncio.to_thread(get_perceptual_index)
+    # Load the tokenizer (it may need to be downloaded) before the first request
+    budget = await asyncio.to_thread(context_budget)
+    logger.info(f"Scraped text budget: {budget.content_tokens} tokens for {budget.model}")
+    # Start the parser processes without holding up startup
+    threading.Thread(target=warm_parse_pool, name="parse-pool-warmup", daemon=True).start()
+    if Config.DRIVER_POOL_PREWARM:
+        # Warm in the background so the health check answers while Chrome starts
+        threading.Thread(target=get_driver_pool().warm, name="driver-pool-warmup", daemon=True).start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    if job_queue is not None:
+        await job_queue.stop()
+    if http_client is not None:
+        await http_client.aclose()
+    shutdown_stage_executors()
+    shutdown_page_fetcher()
+    shutdown_parse_pool()
+    shutdown_driver_pool()
+    get_selector_stats().flush()
+    close_stage_cache()
+    close_url_cache()
+
 class ImageRequest(BaseModel):
     image: str  # base64 encoded image
     
 class ImageUrlRequest(BaseModel):
     imageUrl: str  # URL to fetch image from (e.g., Supabase storage)
 
+class JobRequest(BaseModel):
+    image: Optional[str] = None     # base64 encoded image
+    imageUrl: Optional[str] = None  # or URL to fetch image from
+
 def remove_files(request_id: str):
     if Config.REMOVE_IMAGES:
         image_path = f"{Config.IMAGE_DIR}/image_{request_id}.{Config.IMAGE_FILE_EXTENSION}"
@@ -64,98 +134,453 @@ def remove_files(request_id: str):
             logger.info(f"Removed text file: {txt_path}")
 
 
+def _ignore_event(event, data):
+    pass
+
+def _produce_lens_links(image_path, csv_path, channel, emit=_ignore_event):
+    """Browser stage: push Lens results into the channel until done or the consumer stops"""
+    try:
+        with closing(stream_google_lens_search(image_path, csv_path)) as lens_links:
+            for result in lens_links:
+                if not channel.put(result):
+                    break
+                emit("lens_link", result.to_dict())
+    except BaseException as e:
+        channel.finish(e)
+    else:
+        channel.finish()
+
+def _source_event(index, link, extracted):
+    """Payload of the "source" event sent as each scraped source finishes"""
+    return {
+        "index": index,
+        "url": link.url,
+        "domain": link.domain,
+        "scraped": extracted is not None,
+        "chars": len(extracted[1]) if extracted else 0,
+    }
+
+def _track_links(lens_links, found):
+    """Pass Lens results on to the scraper while recording them"""
+    with closing(lens_links):
+        for result in lens_links:
+            found.append(result)
+            yield result
+
+def _format_sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+# Room for multipart boundaries and part headers on top of the image size cap
+MULTIPART_OVERHEAD = 64 * 1024
+
+# Client-facing reason for images Pillow cannot read; the decoder's message is only logged
+UNSUPPORTED_IMAGE = "Unsupported or corrupt image"
+
+def _capped_receive(receive, max_bytes):
+    """Wrap an ASGI receive callable so the body is rejected once it exceeds max_bytes"""
+    received = 0
+
+    async def capped():
+        nonlocal received
+        message = await receive()
+        if message["type"] == "http.request":
+            received += len(message.get("body", b""))
+            if received > max_bytes:
+                raise ImageTooLarge(f"Request body exceeds the {max_bytes} byte limit")
+        return message
+
+    return capped
+
+async def _receive_multipart(request: Request, sink: ImageSink):
+    capped = Request(request.scope, _capped_receive(request.receive, Config.MAX_IMAGE_BYTES + MULTIPART_OVERHEAD))
+    async with capped.form(max_files=1) as form:
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=400, detail="Multipart upload must contain the image in a 'file' field")
+        if upload.content_type and not is_image_content_type(upload.content_type):
+            raise HTTPException(status_code=415, detail=f"Unsupported file type: {upload.content_type}")
+        await asyncio.to_thread(sink.copy_from, upload.file)
+
+async def _receive_image(request: Request):
+    """Stream a multipart or raw image/* request body into a size-capped ImageSink"""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    multipart = content_type == "multipart/form-data"
+    if not multipart and not is_image_content_type(content_type):
+        raise HTTPException(status_code=415, detail="Send multipart/form-data or an image/* body")
+    
+    # Reject early when the client announces a body that is too large
+    limit = Config.MAX_IMAGE_BYTES + (MULTIPART_OVERHEAD if multipart else 0)
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > limit:
+        raise HTTPException(status_code=413, detail=f"Image exceeds the {Config.MAX_IMAGE_BYTES} byte limit")
+    
+    sink = ImageSink()
+    try:
+        if multipart:
+            await _receive_multipart(request, sink)
+        else:
+            async for chunk in request.stream():
+                sink.write(chunk)
+        if sink.size == 0:
+            raise HTTPException(status_code=400, detail="Empty image upload")
+    except ImageTooLarge as e:
+        sink.close()
+        logger.warning(f"Rejected upload: {e}")
+        raise HTTPException(status_code=413, detail=str(e))
+    except BaseException:
+        sink.close()
+        raise
+    logger.info(f"Received {sink.size} byte image upload ({content_type})")
+    return sink
+
+async def _sink_from_base64(image_base64: str):
+    try:
+        return await asyncio.to_thread(ImageSink.from_base64, image_base64)
+    except ValueError as e:
+        logger.error(f"Failed to decode base64 image: {e}")
+        raise HTTPException(status_code=400, detail="Invalid base64 image")
+    except ImageTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+
 @app.get("/")
 async def root():
     return {"message": "Google Lens Scraper API is running. Use /analyze endpoint with a base64 encoded image."}
 
 @app.post("/analyze")
-async def process_image(request: ImageRequest, background_tasks: BackgroundTasks):
+async def process_image(request: ImageRequest):
     """Process image analysis with base64 encoded image"""
-    return await _process_image_analysis(request.image, background_tasks)
+    image = await _sink_from_base64(request.image)
+    return await _process_image_analysis(image)
+
+@app.post("/analyze/upload")
+async def process_image_upload(request: Request):
+    """Process image analysis with the raw image bytes, either as multipart/form-data
+    (field 'file') or as the request body with an image/* content type"""
+    image = await _receive_image(request)
+    return await _process_image_analysis(image)
+
+@app.post("/analyze/stream")
+async def process_image_stream(request: ImageRequest):
+    """Same as /analyze, but reports progress as Server-Sent Events.
+
+    Events: accepted, lens_link (one per link), lens_links (the full list once the
+    search is done), source (one per scraped page), llm_token (analysis fragments),
+    then result with the /analyze payload, or error.
+    """
+    image = await _sink_from_base64(request.image)
+    return StreamingResponse(
+        _stream_analysis(image),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @app.post("/analyze-url")
-async def process_image_url(request: ImageUrlRequest, background_tasks: BackgroundTasks):
+async def process_image_url(request: ImageUrlRequest):
     """Process image analysis with image URL (e.g., from Supabase storage)"""
     try:
-        logger.info(f"Received image URL analysis request: {request.imageUrl[:100]}...")
-        
-        # Fetch image from URL with proper headers and timeout
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        
-        logger.info(f"Fetching image from URL with timeout=30s")
-        response = requests.get(request.imageUrl, headers=headers, timeout=30)
-        response.raise_for_status()
-        
-        # Log response info
-        logger.info(f"Image fetch successful - Status: {response.status_code}, Content-Type: {response.headers.get('content-type')}, Size: {len(response.content)} bytes")
-        
-        # Convert to base64
-        image_base64 = base64.b64encode(response.content).decode('utf-8')
-        logger.info(f"Successfully converted image URL to base64 (size: {len(image_base64)} chars)")
-        
-        return await _process_image_analysis(image_base64, background_tasks)
-        
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Failed to fetch image from URL {request.imageUrl}: {e}")
-        raise HTTPException(status_code=400, detail=f"Failed to fetch image from URL: {str(e)}")
+        image = await _fetch_image(request.imageUrl)
+        return await _process_image_analysis(image)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing image URL: {e}")
         raise HTTPException(status_code=500, detail=f"Error processing image URL: {str(e)}")
 
-async def _process_image_analysis(image_base64: str, background_tasks: BackgroundTasks):
+@app.post("/jobs", status_code=202)
+async def create_job(request: JobRequest):
+    """Queue an analysis (base64 image or image URL) and return a job id to poll"""
+    if bool(request.image) == bool(request.imageUrl):
+        raise HTTPException(status_code=400, detail="Provide exactly one of 'image' or 'imageUrl'")
+    try:
+        job = job_queue.submit(request)
+    except asyncio.QueueFull:
+        logger.warning("Job queue is full, rejecting job")
+        return JSONResponse(
+            status_code=503,
+            content={"detail": "Job queue is full, retry later"},
+            headers={"Retry-After": str(Config.JOB_RETRY_AFTER)},
+        )
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "queue_position": job_queue.position(job),
+        "status_url": f"/jobs/{job.id}",
+    }
+
+@app.get("/jobs/stats")
+async def job_stats():
+    """Queue depth and worker usage, e.g. for autoscaling"""
+    return {
+        "jobs": job_queue.stats(),
+        "stages": get_stage_executors().stats(),
+        "in_flight": in_flight.stats(),
+        "drivers": get_driver_pool().stats(),
+    }
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Entries and hit/miss counters of the stage cache and the scraped-page cache"""
+    def collect():
+        url_cache = get_url_cache()
+        return {"stages": get_stage_cache().stats(), "urls": url_cache.stats() if url_cache else {}}
+    return await asyncio.to_thread(collect)
+
+@app.get("/scrape/domains")
+async def scrape_domains():
+    """Success rate, latency, timeout and circuit state of every scraped host"""
+    return get_domain_stats().snapshot()
+
+@app.get("/scrape/fetcher")
+async def scrape_fetcher():
+    """Concurrency limits of the shared page fetcher and the hosts it is fetching from now"""
+    return get_page_fetcher().stats()
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status of a queued job, with its result once it has finished"""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    data = job.to_dict()
+    data["queue_position"] = job_queue.position(job)
+    return data
+
+async def _fetch_image(image_url: str):
+    """Stream an image from a URL into an ImageSink"""
+    logger.info(f"Received image URL analysis request: {image_url[:100]}...")
+    try:
+        return await fetch_image(http_client, image_url)
+    except ImageTooLarge as e:
+        logger.warning(f"Image at {image_url} rejected: {e}")
+        raise HTTPException(status_code=413, detail=str(e))
+    except ImageFetchError as e:
+        logger.error(f"Image at {image_url} rejected: {e}")
+        raise HTTPException(status_code=415, detail="The URL did not return an image")
+    except httpx.HTTPError as e:
+        logger.error(f"Failed to fetch image from URL {image_url}: {e}")
+        raise HTTPException(status_code=400, detail=f"Failed to fetch image from URL: {str(e)}")
+
+async def _run_job(payload: JobRequest):
+    """Job queue handler: run the same pipeline as /analyze"""
+    if payload.image:
+        image = await _sink_from_base64(payload.image)
+    else:
+        image = await _fetch_image(payload.imageUrl)
+    return await _analyze(image, str(uuid.uuid4()))
+
+async def _stream_analysis(image: ImageSink):
+    """Run the pipeline in a task and yield its events as SSE messages"""
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+    request_id = str(uuid.uuid4())
+
+    def emit(event, data):
+        # Called from the stage threads as well as the event loop
+        loop.call_soon_threadsafe(events.put_nowait, (event, data))
+
+    async def run():
+        try:
+            emit("result", await _analyze(image, request_id, emit))
+        except HTTPException as e:
+            emit("error", {"status_code": e.status_code, "detail": e.detail})
+        except Exception as e:
+            logger.error(f"Error streaming request {request_id}: {e}")
+            emit("error", {"status_code": 500, "detail": str(e)})
+        finally:
+            emit(None, None)
+
+    task = asyncio.create_task(run())
+    try:
+        while True:
+            event, data = await events.get()
+            if event is None:
+                break
+            yield _format_sse(event, data)
+    finally:
+        # The client went away; stop waiting on the remaining stages
+        if not task.done():
+            task.cancel()
+
+async def _process_image_analysis(image: ImageSink):
     """Core image analysis logic shared by both endpoints"""
+    # Generate unique ID for this request
+    request_id = str(uuid.uuid4())
+    return await _analyze(image, request_id)
+
+async def _analyze(image: ImageSink, request_id: str, emit=None):
+    """Run the analysis for an image, or join an identical one that is already running.
+
+    The request that starts the work also removes its files afterwards; requests
+    that join it get the same result under their own request_id.
+    """
+    # Reject non-images from the header before any stage runs
+    try:
+        image_format, image_size = await asyncio.to_thread(probe_image, image.reader())
+    except InvalidImage as e:
+        image.close()
+        logger.warning(f"Rejected upload for request {request_id}: {e}")
+        raise HTTPException(status_code=415, detail=UNSUPPORTED_IMAGE)
+    logger.info(f"Received {image_format} image {image_size[0]}x{image_size[1]} ({image.size} bytes)")
+    
+    key = image.digest
+    leader = in_flight.leader(key)
+    if leader is not None:
+        image.close()
+        (emit or _ignore_event)("accepted", {"request_id": request_id, "image_sha256": key, "coalesced_with": leader})
+
+    async def run():
+        try:
+            return await _run_analysis(image, request_id, emit)
+        finally:
+            await asyncio.to_thread(remove_files, request_id)
+
+    result, owner = await in_flight.do(key, request_id, run)
+    if owner == request_id:
+        return result
+    return {**result, "request_id": request_id, "coalesced_with": owner}
+
+def _find_near_duplicate(image, cache):
+    """Return (dhash, sha256, cached Lens links) for the nearest earlier image that still has cached links"""
+    image_hash = dhash(image.reader())
+    if image_hash is None or not is_distinctive(image_hash):
+        # Flat images all hash alike, so a match would say nothing about the content
+        return None, None, None
+    for match_digest, distance in get_perceptual_index().lookup(image_hash):
+        links = cache.get("lens", match_digest)
+        if links is not None:
+            logger.info(f"Image is a near-duplicate of {match_digest[:12]} (distance {distance})")
+            return image_hash, match_digest, links
+    return image_hash, None, None
+
+async def _search_and_scrape(image_path, csv_path, txt_path, notify, on_source):
+    """Run Google Lens search and scrape each link as soon as Lens yields it"""
+    # The browser and scrape stages run on their own bounded pools, linked by a channel.
+    logger.info("Starting Google Lens search for image")
+    stages = get_stage_executors()
+    lens_links = []
+    channel = Channel()
+    # The producer always finishes the channel, so its future is not awaited here
+    stages.run("browser", _produce_lens_links, image_path, csv_path, channel, notify)
+    try:
+        scraped_content = await stages.run(
+            "scrape",
+            scrape_links,
+            _track_links(channel, lens_links),
+            txt_path,
+            max_urls=Config.MAX_URLS_TO_SCRAPE,
+            on_source=on_source
+        )
+    except LensSearchError as e:
+        logger.error(f"Google Lens search failed: {e}")
+        raise HTTPException(status_code=500, detail="Google Lens search failed")
+    finally:
+        channel.close()
+    # Sent from the consumer side: once the scrape budget is met the producer stops
+    # early and may never reach the end of its loop
+    notify("lens_links", {"count": len(lens_links), "links": [link.to_dict() for link in lens_links]})
+    return lens_links, scraped_content
+
+async def _run_analysis(image: ImageSink, request_id: str, emit=None):
+    """Run the Lens, scrape and LLM stages for one image and build the response payload.
+
+    The image sink is saved for the browser and then closed.
+
+    emit(event, data), if given, receives progress events; it must be thread-safe
+    because the stages call it from their worker threads.
+    """
+    notify = emit or _ignore_event
     try:
-        # Generate unique ID for this request
-        request_id = str(uuid.uuid4())
         logger.info(f"Processing new request: {request_id}")
         
-        # Decode and save base64 image
-        image_path = f"{Config.IMAGE_DIR}/image_{request_id}.{Config.IMAGE_FILE_EXTENSION}"
-        try:
-            with open(image_path, "wb") as img_file:
-                img_data = base64.b64decode(image_base64)
-                img_file.write(img_data)
-            logger.info(f"Image saved at {image_path}")
-        except Exception as e:
-            logger.error(f"Failed to decode base64 image: {e}")
-            raise HTTPException(status_code=400, detail="Invalid base64 image")
+        # Reuse earlier stage outputs for the same image bytes, or failing that
+        # for a near-duplicate image (re-encoded or re-photographed)
+        cache = get_stage_cache()
+        digest = image.digest
+        cached_links = await asyncio.to_thread(cache.get, "lens", digest)
+        source_digest = digest
+        image_hash = None
+        if cached_links is None and Config.PHASH_ENABLED:
+            image_hash, match_digest, cached_links = await asyncio.to_thread(_find_near_duplicate, image, cache)
+            if match_digest:
+                source_digest = match_digest
+        scrape_key = content_key(source_digest, Config.MAX_URLS_TO_SCRAPE, context_budget().char_limit)
         
-        # Run Google Lens search
-        csv_path = f"{Config.CSV_DIR}/results_{request_id}.csv"
-        logger.info(f"Starting Google Lens search for image")
-        result = run_google_lens_search(image_path, csv_path)
-        if not result:
-            raise HTTPException(status_code=500, detail="Google Lens search failed")
-        logger.info(f"Google Lens results saved to {csv_path}")
+        # Results stay in memory; CSV/TXT files are only written when enabled.
+        csv_path = f"{Config.CSV_DIR}/results_{request_id}.csv" if Config.SAVE_CSVS and cached_links is None else None
+        txt_path = f"{Config.TXT_DIR}/content_{request_id}.txt" if Config.SAVE_TXT else None
         
-        # Scrape content from URLs
-        txt_path = f"{Config.TXT_DIR}/content_{request_id}.txt"
-        logger.info(f"Scraping content from top URLs")
-        scraped_content = scrape_first_urls(
-            csv_path, 
-            txt_path, 
-            max_urls=Config.MAX_URLS_TO_SCRAPE, 
-            char_limit=Config.MAX_CHARACTERS_IN_SUMMARY
-        )
-        logger.info(f"Scraped content saved to {txt_path}")
+        if cached_links is None:
+            # Save the image, normalized, where the browser can upload it from
+            image_path = f"{Config.IMAGE_DIR}/image_{request_id}.{Config.IMAGE_FILE_EXTENSION}"
+            try:
+                if Config.IMAGE_NORMALIZE:
+                    await asyncio.to_thread(normalize_image, image.reader(), image_path)
+                else:
+                    await asyncio.to_thread(image.save, image_path)
+                logger.info(f"Image saved at {image_path}")
+            except InvalidImage as e:
+                logger.warning(f"Could not decode image for request {request_id}: {e}")
+                raise HTTPException(status_code=415, detail=UNSUPPORTED_IMAGE)
+            except Exception as e:
+                logger.error(f"Failed to save image: {e}")
+                raise HTTPException(status_code=500, detail="Failed to save image")
+            finally:
+                image.close()
+        else:
+            image.close()
+        notify("accepted", {"request_id": request_id, "image_sha256": digest})
+        
+        on_source = (lambda index, link, extracted: emit("source", _source_event(index, link, extracted))) if emit else None
+        
+        stages = get_stage_executors()
+        scraped_content = None
+        if cached_links is not None:
+            lens_links = [LensResult(**link) for link in cached_links]
+            logger.info(f"Using {len(lens_links)} cached Google Lens links for image {source_digest[:12]}")
+            notify("lens_links", {"count": len(lens_links), "links": cached_links, "cached": True})
+            scraped_content = await asyncio.to_thread(cache.get, "scrape", scrape_key)
+            if scraped_content is not None:
+                txt_path = None
+            else:
+                scraped_content = await stages.run(
+                    "scrape",
+                    scrape_links,
+                    lens_links,
+                    txt_path,
+                    max_urls=Config.MAX_URLS_TO_SCRAPE,
+                    on_source=on_source
+                )
+                if scraped_content:
+                    await asyncio.to_thread(cache.put, "scrape", scrape_key, scraped_content)
+        else:
+            lens_links, scraped_content = await _search_and_scrape(image_path, csv_path, txt_path, notify, on_source)
+            # Empty results are usually a blocked or broken search, so they are not cached
+            if lens_links:
+                await asyncio.to_thread(cache.put, "lens", digest, [link.to_dict() for link in lens_links])
+                if image_hash is not None:
+                    await asyncio.to_thread(get_perceptual_index().add, image_hash, digest)
+            if scraped_content:
+                await asyncio.to_thread(cache.put, "scrape", scrape_key, scraped_content)
+        logger.info(f"Google Lens found {len(lens_links)} links, scraped {len(scraped_content)} chars")
         
         # Get OpenAI analysis
-        logger.info(f"Sending content to LLM for analysis")
-        analysis = get_llm_analysis(scraped_content)
-        logger.info(f"Analysis received from LLM")
+        logger.info("Sending content to LLM for analysis")
+        on_token = (lambda text: emit("llm_token", {"text": text})) if emit else None
+        analysis = await stages.run("llm", get_llm_analysis, scraped_content, on_token=on_token)
+        logger.info("Analysis received from LLM")
         
-        background_tasks.add_task(func=remove_files, request_id=request_id)
         return {
             "analysis": analysis,
             "request_id": request_id,
-            "google_lens_links_found": result if isinstance(result, int) else "Success",
+            "google_lens_links_found": len(lens_links),
             "scraped_content_length": len(scraped_content),
-            "csv_file": f"csv/results_{request_id}.csv",
-            "content_file": f"txt/content_{request_id}.txt"
+            "csv_file": f"csv/results_{request_id}.csv" if csv_path and lens_links else None,
+            "content_file": f"txt/content_{request_id}.txt" if txt_path and scraped_content else None
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing request: {e}")
         raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,76 @@
+"""
+Near-duplicate detection for scraped excerpts.
+
+Lens often returns several copies of the same listing: syndicated product
+feeds, reseller copies, translated storefronts. Each excerpt is reduced to a
+MinHash signature of its word shingles; two excerpts whose signatures agree on
+at least DEDUP_THRESHOLD of their positions (an estimate of the Jaccard
+similarity of their shingle sets) are treated as the same content. With at
+most a few dozen sources per request, signatures are compared pairwise rather
+than through LSH buckets.
+"""
+import logging
+import random
+import re
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+_PRIME = (1 << 61) - 1
+_MASK = (1 << 61) - 1
+_WORD = re.compile(r'\w+')
+
+
+def shingles(text, size):
+    """Hashes of the overlapping size-word windows of text (lowercased, punctuation ignored)"""
+    words = _WORD.findall(text.lower())
+    if len(words) <= size:
+        return {hash(tuple(words)) & _MASK} if words else set()
+    return {hash(tuple(words[i:i + size])) & _MASK for i in range(len(words) - size + 1)}
+
+
+class MinHasher:
+    """MinHash signatures from num_hashes universal hash functions"""
+
+    def __init__(self, num_hashes=64, shingle_size=5, seed=1):
+        rng = random.Random(seed)
+        self.shingle_size = shingle_size
+        self.params = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_hashes)]
+
+    def signature(self, text):
+        hashes = shingles(text, self.shingle_size)
+        if not hashes:
+            return None
+        return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in self.params)
+
+
+def similarity(signature, other):
+    """Estimated Jaccard similarity of the shingle sets behind two signatures"""
+    return sum(1 for x, y in zip(signature, other) if x == y) / len(signature)
+
+
+class NearDuplicateFilter:
+    """Remembers the excerpts kept so far and flags new ones that repeat them"""
+
+    def __init__(self, threshold, num_hashes=64, shingle_size=5, min_chars=200):
+        self.threshold = threshold
+        self.min_chars = min_chars
+        self.hasher = MinHasher(num_hashes, shingle_size)
+        self._kept = []  # (signature, label)
+
+    def duplicate_of(self, text, label=None):
+        """Label of a kept excerpt that text nearly duplicates, or None (text is then kept).
+
+        Excerpts shorter than min_chars (e.g. one-line product records) carry too
+        few shingles to compare and are always kept.
+        """
+        if len(text) < self.min_chars:
+            return None
+        signature = self.hasher.signature(text)
+        if signature is None:
+            return None
+        for kept, kept_label in self._kept:
+            if similarity(signature, kept) >= self.threshold:
+                return kept_label
+        self._kept.append((signature, label))
+        return None
@@ -0,0 +1,238 @@
+"""
+Pooled asynchronous fetcher for the pages found by Google Lens.
+
+One long-lived httpx.AsyncClient runs on a dedicated event loop thread and is
+shared by every analysis in the process, so connections (and TLS sessions) to
+popular retailers are reused across requests. A global semaphore caps the number
+of pages fetched at once and a per-host semaphore keeps us polite to any single
+site. Callers in worker threads get concurrent.futures.Future objects back.
+Every fetch is reported to the domain statistics, which also pick each host's
+timeout.
+
+Bodies are streamed and reading stops at a byte cap, so a multi-megabyte page
+costs no more than the prefix we will actually parse. Responses that are clearly
+not HTML (PDFs, images) or announce a huge Content-Length are dropped before any
+of the body is read.
+"""
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import dataclass
+import httpx
+from config import Config
+from domain_stats import get_domain_stats, host_of
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+_page_fetcher = None
+_page_fetcher_lock = threading.Lock()
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Referer': 'https://www.google.com/',
+    'DNT': '1',
+}
+
+# Content types worth parsing for text; a missing header is given the benefit of the doubt
+TEXT_CONTENT_TYPES = ("text/html", "application/xhtml+xml", "text/plain")
+
+
+def _http2_available():
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+@dataclass(slots=True)
+class Page:
+    """Raw response body of a fetched page"""
+    url: str
+    status: int
+    content_type: str
+    charset: str
+    body: bytes
+    elapsed_ms: float
+    truncated: bool = False
+    etag: str = ""
+    last_modified: str = ""
+
+    @property
+    def not_modified(self):
+        return self.status == 304
+
+
+class _HostSlot:
+    """Per-host concurrency limit and the number of fetches using it"""
+    __slots__ = ("semaphore", "users")
+
+    def __init__(self, semaphore):
+        self.semaphore = semaphore
+        self.users = 0
+
+
+class PageFetcher:
+    """Shared AsyncClient with global and per-host concurrency limits"""
+
+    def __init__(self, max_concurrency, max_per_host, domain_stats, max_bytes, max_content_length):
+        self.max_concurrency = max_concurrency
+        self.max_per_host = max_per_host
+        self.domain_stats = domain_stats
+        self.max_bytes = max_bytes
+        self.max_content_length = max_content_length
+        self.http2 = _http2_available()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="page-fetcher", daemon=True)
+        self._thread.start()
+        self._client = httpx.AsyncClient(
+            headers=HEADERS,
+            http2=self.http2,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+        )
+        self._global = asyncio.Semaphore(max_concurrency)
+        self._hosts = {}  # host -> _HostSlot of hosts with fetches in flight, only touched on the fetcher loop
+
+    def fetch(self, url, timeout=None, max_bytes=None, headers=None):
+        """Start fetching url; returns a concurrent.futures.Future resolving to a Page or None.
+
+        At most max_bytes of the body are read; the rest of the response is discarded.
+        headers may carry conditional request validators, in which case the Page can
+        come back with status 304 and an empty body. Without an explicit timeout the
+        host's adaptive timeout is used.
+        """
+        timeout = timeout or self.domain_stats.timeout(host_of(url))
+        return asyncio.run_coroutine_threadsafe(
+            self._fetch(url, timeout, max_bytes or self.max_bytes, headers), self._loop
+        )
+
+    async def _fetch(self, url, timeout, max_bytes, headers):
+        host = host_of(url)
+        slot = self._hosts.get(host)
+        if slot is None:
+            slot = self._hosts[host] = _HostSlot(asyncio.Semaphore(self.max_per_host))
+        slot.users += 1
+        try:
+            async with self._global, slot.semaphore:
+                return await self._download(url, host, timeout, max_bytes, headers)
+        finally:
+            # Drop the host's semaphore once nothing is waiting on or holding it
+            slot.users -= 1
+            if not slot.users:
+                del self._hosts[host]
+
+    async def _download(self, url, host, timeout, max_bytes, headers):
+        start = time.perf_counter()
+        # Every way out reports to the domain statistics (a half-open circuit waits on it);
+        # the host is healthy unless an error handler below says otherwise
+        healthy = True
+        try:
+            logger.info(f"Requesting content from {url}")
+            # timeout bounds the whole download, not just each read
+            async with asyncio.timeout(timeout), self._client.stream("GET", url, headers=headers, timeout=timeout) as response:
+                if response.status_code == 304:
+                    return Page(
+                        url=url,
+                        status=304,
+                        content_type="",
+                        charset=None,
+                        body=b"",
+                        elapsed_ms=(time.perf_counter() - start) * 1000,
+                    )
+                response.raise_for_status()
+                content_type = response.headers.get("content-type", "")
+                media_type = content_type.split(";")[0].strip().lower()
+                if media_type and media_type not in TEXT_CONTENT_TYPES:
+                    logger.info(f"Skipping {url}: content type {media_type}")
+                    return None
+                declared = response.headers.get("content-length", "")
+                if declared.isdigit() and int(declared) > self.max_content_length:
+                    logger.info(f"Skipping {url}: Content-Length {declared} exceeds {self.max_content_length}")
+                    return None
+                
+                # Read only the prefix we are going to parse
+                chunks = []
+                received = 0
+                truncated = False
+                async for chunk in response.aiter_bytes():
+                    chunks.append(chunk)
+                    received += len(chunk)
+                    if received >= max_bytes:
+                        truncated = True
+                        break
+                body = b"".join(chunks)[:max_bytes]
+            return Page(
+                url=url,
+                status=response.status_code,
+                content_type=content_type,
+                charset=response.charset_encoding,
+                body=body,
+                elapsed_ms=(time.perf_counter() - start) * 1000,
+                truncated=truncated,
+                etag=response.headers.get("etag", ""),
+                last_modified=response.headers.get("last-modified", ""),
+            )
+        except httpx.HTTPStatusError as e:
+            # Blocking and server errors count against the host; a 404 only against the URL
+            status = e.response.status_code
+            healthy = not (status in (403, 429) or status >= 500)
+            logger.error(f"Error fetching {url}: {e}")
+            return None
+        except (httpx.HTTPError, TimeoutError) as e:
+            healthy = False
+            logger.error(f"Error fetching {url}: {e or type(e).__name__}")
+            return None
+        except asyncio.CancelledError:
+            healthy = None  # Cancelled by us, says nothing about the host
+            raise
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if healthy:
+                self.domain_stats.record_success(host, elapsed_ms)
+            elif healthy is not None:
+                self.domain_stats.record_failure(host, elapsed_ms)
+
+    def stats(self):
+        return {
+            "http2": self.http2,
+            "max_concurrency": self.max_concurrency,
+            "max_per_host": self.max_per_host,
+            "active_hosts": len(self._hosts),
+        }
+
+    def close(self):
+        try:
+            asyncio.run_coroutine_threadsafe(self._client.aclose(), self._loop).result(timeout=5)
+        except Exception as e:
+            logger.warning(f"Error closing page fetcher client: {e}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+
+def get_page_fetcher():
+    """Return the process-wide page fetcher, creating it on first use"""
+    global _page_fetcher
+    with _page_fetcher_lock:
+        if _page_fetcher is None:
+            _page_fetcher = PageFetcher(
+                max_concurrency=Config.FETCH_MAX_CONCURRENCY,
+                max_per_host=Config.FETCH_MAX_PER_HOST,
+                domain_stats=get_domain_stats(),
+                max_bytes=Config.FETCH_MAX_BYTES,
+                max_content_length=Config.FETCH_MAX_CONTENT_LENGTH,
+            )
+            logger.info(f"Created page fetcher (http2={_page_fetcher.http2})")
+        return _page_fetcher
+
+
+def shutdown_page_fetcher():
+    global _page_fetcher
+    with _page_fetcher_lock:
+        fetcher, _page_fetcher = _page_fetcher, None
+    if fetcher is not None:
+        fetcher.close()
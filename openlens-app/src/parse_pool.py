@@ -0,0 +1,86 @@
+"""
+Process pool for HTML parsing.
+
+Text extraction is CPU-bound Python and serializes on the GIL when it runs in
+threads, so fetched page bodies are parsed in separate worker processes instead.
+Workers use the spawn start method (the API process runs threads, which do not
+mix with fork) and are warmed at startup so the first request does not pay for
+starting interpreters and importing the parser libraries.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from config import Config
+from html_text import extract_excerpt, warm_worker
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+_parse_pool = None
+_parse_pool_lock = threading.Lock()
+
+DEFAULT_PARSE_WORKERS = 2
+
+
+def parse_workers():
+    """PARSE_WORKERS if set, else at most DEFAULT_PARSE_WORKERS.
+
+    os.cpu_count() reports the host's CPUs, not the container's quota, and every
+    worker is a full interpreter next to Chrome, so the default stays small.
+    """
+    if Config.PARSE_WORKERS:
+        return Config.PARSE_WORKERS
+    try:
+        usable = len(os.sched_getaffinity(0))
+    except AttributeError:  # Not available on macOS/Windows
+        usable = os.cpu_count() or 1
+    return max(1, min(DEFAULT_PARSE_WORKERS, usable))
+
+
+def _create_pool():
+    workers = parse_workers()
+    logger.info(f"Starting {workers} parser processes")
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def get_parse_pool():
+    """Return the process-wide parser pool, starting it on first use"""
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            _parse_pool = _create_pool()
+        return _parse_pool
+
+
+def submit_parse(body, charset, char_limit):
+    """Parse a page body in a worker process; returns a future for its text excerpt"""
+    global _parse_pool
+    args = (body, charset, Config.HTML_TEXT_BACKEND, char_limit, Config.STRUCTURED_DATA_ENABLED)
+    try:
+        return get_parse_pool().submit(extract_excerpt, *args)
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for memory); replace the pool and retry once
+        logger.warning("Parser pool is broken, restarting it")
+        with _parse_pool_lock:
+            broken, _parse_pool = _parse_pool, _create_pool()
+        broken.shutdown(wait=False, cancel_futures=True)
+        return get_parse_pool().submit(extract_excerpt, *args)
+
+
+def warm_parse_pool():
+    """Start every worker and import the parser libraries ahead of the first request"""
+    pool = get_parse_pool()
+    futures = [pool.submit(warm_worker, Config.HTML_TEXT_BACKEND) for _ in range(parse_workers())]
+    pids = {future.result() for future in futures}
+    logger.info(f"Parser pool warm ({len(pids)} processes)")
+
+
+def shutdown_parse_pool():
+    global _parse_pool
+    with _parse_pool_lock:
+        pool, _parse_pool = _parse_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,223 @@
+"""
+Near-duplicate image lookup.
+
+A 64-bit difference hash (dHash) is computed for each uploaded image and stored in
+a BK-tree together with the SHA-256 of the analysed bytes. A re-photographed or
+re-encoded item usually lands within a few bits of the original, so its earlier
+Lens links and analysis can be served from the stage cache. The index is a text
+file of "<dhash> <sha256>" lines, appended to as images are analysed. On startup
+it is replayed, entries whose Lens results are no longer cached are dropped, and
+the file is rewritten without them.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from PIL import Image
+from config import Config
+from stage_cache import get_stage_cache
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+_perceptual_index = None
+_perceptual_index_lock = threading.Lock()
+
+HASH_SIZE = 8  # 8x8 comparisons -> 64-bit hash
+
+
+def dhash(fileobj, hash_size=HASH_SIZE):
+    """Difference hash of an image file object, or None if it cannot be decoded"""
+    try:
+        with Image.open(fileobj) as img:
+            # Let JPEG decoding downscale on the fly; the hash only needs a tiny image
+            img.draft("L", (hash_size * 8, hash_size * 8))
+            small = img.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS)
+            pixels = list(small.getdata())
+    except Exception as e:
+        logger.warning(f"Could not compute perceptual hash: {e}")
+        return None
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def is_distinctive(key, hash_size=HASH_SIZE):
+    """False for the near-constant hashes of flat or solid-colour images.
+
+    Those all land within a few bits of each other whatever their content, so
+    they are neither looked up nor indexed.
+    """
+    bits = key.bit_count()
+    return Config.PHASH_MIN_BITS < bits < hash_size * hash_size - Config.PHASH_MIN_BITS
+
+
+class BKTree:
+    """Burkhard-Keller tree over integer hashes with Hamming distance"""
+
+    def __init__(self):
+        self._root = None  # [hash, [values], {distance: child}]
+        self.size = 0
+
+    def add(self, key, value):
+        if self._root is None:
+            self._root = [key, [value], {}]
+            self.size = 1
+            return
+        node = self._root
+        while True:
+            distance = (key ^ node[0]).bit_count()
+            if distance == 0:
+                # Different images can share a hash; keep them all
+                if value not in node[1]:
+                    node[1].append(value)
+                    self.size += 1
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [key, [value], {}]
+                self.size += 1
+                return
+            node = child
+
+    def search(self, key, max_distance):
+        """Return (distance, hash, value) for all entries within max_distance, nearest first"""
+        if self._root is None:
+            return []
+        matches = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            distance = (key ^ node[0]).bit_count()
+            if distance <= max_distance:
+                matches.extend((distance, node[0], value) for value in node[1])
+            for child_distance, child in node[2].items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    stack.append(child)
+        matches.sort(key=lambda match: match[0])
+        return matches
+
+
+class PerceptualIndex:
+    """BK-tree of image dHashes persisted as an append-only file, compacted on load.
+
+    live_digests, if given, is the set of digests that still have cached Lens
+    results; other entries are dropped on load. At most max_entries of the most
+    recently added images are kept.
+    """
+
+    def __init__(self, path, max_distance, max_entries, live_digests=None):
+        self.path = path
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self._tree = BKTree()
+        self._entries = OrderedDict()  # sha256 -> dhash, oldest first
+        self._lock = threading.Lock()
+        self._load(live_digests)
+
+    def _load(self, live_digests):
+        if not self.path or not os.path.exists(self.path):
+            return
+        start = time.perf_counter()
+        lines = 0
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    lines += 1
+                    parts = line.split()
+                    if len(parts) != 2:
+                        continue
+                    key, digest = int(parts[0], 16), parts[1]
+                    if live_digests is not None and digest not in live_digests:
+                        continue
+                    if not is_distinctive(key):
+                        continue
+                    # A re-analysed image moves to the end, as if added last
+                    self._entries.pop(digest, None)
+                    self._entries[digest] = key
+        except Exception as e:
+            logger.warning(f"Could not load perceptual index from {self.path}: {e}")
+            return
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        self._rebuild()
+        if lines != len(self._entries):
+            self._rewrite()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        logger.info(
+            f"Loaded {self._tree.size} perceptual hashes from {self.path} in {elapsed_ms:.0f}ms "
+            f"({lines - self._tree.size} stale or duplicate lines dropped)"
+        )
+
+    def _rebuild(self):
+        self._tree = BKTree()
+        for digest, key in self._entries.items():
+            self._tree.add(key, digest)
+
+    def _rewrite(self):
+        """Replace the file with the current entries"""
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for digest, key in self._entries.items():
+                    f.write(f"{key:016x} {digest}\n")
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.warning(f"Could not rewrite perceptual index {self.path}: {e}")
+
+    def lookup(self, key):
+        """Indexed images within max_distance as (sha256, distance), nearest first"""
+        if not is_distinctive(key):
+            return []
+        with self._lock:
+            matches = self._tree.search(key, self.max_distance)
+        return [(digest, distance) for distance, _, digest in matches]
+
+    def add(self, key, digest):
+        if not is_distinctive(key):
+            return
+        with self._lock:
+            if self._entries.get(digest) == key:
+                return  # Already indexed
+            self._entries.pop(digest, None)
+            self._entries[digest] = key
+            if len(self._entries) > self.max_entries * 1.1:
+                # A BK-tree cannot delete, so trim back to max_entries and rebuild now and then
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                self._rebuild()
+                if self.path:
+                    self._rewrite()
+                return
+            self._tree.add(key, digest)
+            if not self.path:
+                return
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(f"{key:016x} {digest}\n")
+            except Exception as e:
+                logger.warning(f"Could not append to perceptual index {self.path}: {e}")
+
+    @property
+    def size(self):
+        return len(self._entries)
+
+
+def get_perceptual_index():
+    """Return the process-wide perceptual index, loading it on first use"""
+    global _perceptual_index
+    with _perceptual_index_lock:
+        if _perceptual_index is None:
+            _perceptual_index = PerceptualIndex(
+                path=Config.PHASH_INDEX_PATH,
+                max_distance=Config.PHASH_MAX_DISTANCE,
+                max_entries=Config.PHASH_MAX_ENTRIES,
+                live_digests=get_stage_cache().live_keys("lens"),
+            )
+        return _perceptual_index
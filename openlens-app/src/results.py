@@ -0,0 +1,55 @@
+"""
+In-memory records passed between pipeline stages, with optional CSV persistence
+"""
+import csv
+import logging
+import os
+from dataclasses import asdict, dataclass
+from urllib.parse import urlparse
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+CSV_HEADER = ['URL', 'Description']
+
+
+@dataclass(slots=True, frozen=True)
+class LensResult:
+    """One external link found by Google Lens; rank is its position in the results (0-based)"""
+    url: str
+    description: str
+    rank: int
+    domain: str
+
+    @classmethod
+    def from_link(cls, url, description, rank):
+        return cls(url=url, description=description or "", rank=rank, domain=urlparse(url).netloc)
+
+    def to_dict(self):
+        return asdict(self)
+
+
+def write_results_csv(csv_path, results):
+    """Write Lens results to a CSV side-output"""
+    os.makedirs(os.path.dirname(csv_path) or ".", exist_ok=True)
+    with open(csv_path, 'w', newline='', encoding='utf-8') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(CSV_HEADER)
+        for result in results:
+            writer.writerow([result.url, result.description])
+    logger.info(f"Results saved to {csv_path}")
+
+
+def read_results_csv(csv_path):
+    """Yield LensResult records from a CSV written by write_results_csv"""
+    try:
+        with open(csv_path, 'r', encoding='utf-8') as csv_file:
+            reader = csv.reader(csv_file)
+            next(reader)  # Skip header
+            rank = 0
+            for row in reader:
+                if row and row[0]:
+                    yield LensResult.from_link(row[0], row[1] if len(row) > 1 else "", rank)
+                    rank += 1
+    except Exception as e:
+        logger.error(f"Error reading CSV file {csv_path}: {e}")
@@ -0,0 +1,133 @@
+"""
+Learned ordering for the Lens UI selector candidates.
+
+Every time a probed selector leads to a working click, its score goes up. Scores
+decay with a configurable half-life, so when Google changes the page the order
+adapts within a few requests. Statistics live in memory and are flushed to a
+small JSON file so the learned order survives restarts.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from config import Config
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+_selector_stats = None
+_selector_stats_lock = threading.Lock()
+
+
+class SelectorStats:
+    """Per-group hit counts, latency and decayed scores for selector candidates"""
+
+    def __init__(self, path, half_life, flush_interval):
+        self.path = path
+        self.half_life = half_life
+        self.flush_interval = flush_interval
+        self._groups = {}  # group -> candidate key -> entry dict
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_flush = time.monotonic()
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._groups = json.load(f)
+            logger.info(f"Loaded selector statistics from {self.path}")
+        except Exception as e:
+            logger.warning(f"Could not load selector statistics from {self.path}: {e}")
+            self._groups = {}
+
+    def _decayed(self, entry, now):
+        elapsed = max(0.0, now - entry["updated"])
+        return entry["score"] * 0.5 ** (elapsed / self.half_life)
+
+    def _entry(self, group, key):
+        entries = self._groups.setdefault(group, {})
+        entry = entries.get(key)
+        if entry is None:
+            entry = entries[key] = {"score": 0.0, "hits": 0, "misses": 0, "avg_ms": 0.0, "updated": time.time()}
+        return entry
+
+    def order(self, group, candidates):
+        """Return candidates with the historically best ones first (ties keep the original order)"""
+        now = time.time()
+        with self._lock:
+            entries = self._groups.get(group, {})
+            scores = {key: self._decayed(entry, now) for key, entry in entries.items()}
+        return sorted(candidates, key=lambda c: -scores.get(c.key, 0.0))
+
+    def record_success(self, group, key, elapsed_ms):
+        now = time.time()
+        with self._lock:
+            entry = self._entry(group, key)
+            entry["score"] = self._decayed(entry, now) + 1.0
+            entry["hits"] += 1
+            # Exponential moving average of probe latency
+            entry["avg_ms"] = elapsed_ms if entry["hits"] == 1 else 0.8 * entry["avg_ms"] + 0.2 * elapsed_ms
+            entry["updated"] = now
+            self._dirty = True
+        self._maybe_flush()
+
+    def record_failure(self, group, key):
+        """The candidate matched but did not lead to the expected page state"""
+        now = time.time()
+        with self._lock:
+            entry = self._entry(group, key)
+            entry["score"] = self._decayed(entry, now) * 0.5
+            entry["misses"] += 1
+            entry["updated"] = now
+            self._dirty = True
+        self._maybe_flush()
+
+    def _maybe_flush(self):
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Write the statistics to disk if anything changed"""
+        with self._lock:
+            if not self._dirty or not self.path:
+                return
+            data = json.dumps(self._groups, indent=2)
+            self._dirty = False
+            self._last_flush = time.monotonic()
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+            logger.debug(f"Selector statistics flushed to {self.path}")
+        except Exception as e:
+            logger.warning(f"Could not write selector statistics to {self.path}: {e}")
+
+    def snapshot(self):
+        now = time.time()
+        with self._lock:
+            return {
+                group: {
+                    key: {**entry, "score": round(self._decayed(entry, now), 3)}
+                    for key, entry in entries.items()
+                }
+                for group, entries in self._groups.items()
+            }
+
+
+def get_selector_stats():
+    """Return the process-wide selector statistics, loading them on first use"""
+    global _selector_stats
+    with _selector_stats_lock:
+        if _selector_stats is None:
+            _selector_stats = SelectorStats(
+                path=Config.SELECTOR_STATS_PATH,
+                half_life=Config.SELECTOR_STATS_HALF_LIFE,
+                flush_interval=Config.SELECTOR_STATS_FLUSH_INTERVAL,
+            )
+        return _selector_stats
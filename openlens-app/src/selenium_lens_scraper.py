@@ -6,17 +6,112 @@ from selenium.webdriver.common.by import By
 import time
 import random
 from selenium.webdriver.common.action_chains import ActionChains
-import csv
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 import os
 import logging
 import argparse
+import threading
 from config import Config
+from driver_pool import DriverPool
+from wait_engine import WaitEngine, DOM_SETTLED, FILE_INPUT_PRESENT
+from dom_probe import css, xpath, contains_text, probe_selectors, wait_for_probe
+from selector_stats import get_selector_stats
+from results import LensResult, write_results_csv
 
 # Setup logging
 logger = logging.getLogger(__name__)
 
+_driver_pool = None
+_driver_pool_lock = threading.Lock()
+
+# In-page conditions for the Lens flow (see wait_engine.WaitEngine.until)
+CONSENT_OR_SEARCH_READY = """
+    return document.querySelector(
+        "textarea[name='q'], input[name='q'], button[id*='consent' i], button[class*='consent' i], form[action*='consent']"
+    );
+"""
+
+LENS_UI_OPEN = """
+    const url = location.href.toLowerCase();
+    return document.querySelector("input[type='file']") ||
+           url.includes('lens') || url.includes('imgres');
+"""
+
+LENS_URL_OPEN = """
+    const url = location.href.toLowerCase();
+    return url.includes('lens') || url.includes('imgres');
+"""
+
+EXTERNAL_LINKS_PRESENT = r"""
+    const blocked = /(^|\.)(google\.[a-z.]+|gstatic\.com|googleapis\.com|googleusercontent\.com|chrome\.com)$/;
+    let count = 0;
+    for (const a of document.getElementsByTagName('a')) {
+        const href = a.getAttribute('href') || '';
+        if (!href.startsWith('http')) continue;
+        try {
+            if (!blocked.test(new URL(href).hostname)) count++;
+        } catch (e) {}
+    }
+    return count;
+"""
+
+# Candidate locators, in order of preference. Each list is evaluated by a single batched probe.
+COOKIE_ACCEPT_CANDIDATES = [
+    xpath("//button[contains(., 'accept') or contains(., 'Accept') or .//span[contains(., 'accept') or contains(., 'Accept')]]"),
+    css("button[id*='consent' i], button[class*='consent' i]"),
+]
+
+LENS_BUTTON_CANDIDATES = [
+    # Primary selector based on data-attribute
+    css("[data-base-lens-url='https://lens.google.com']"),
+    # Alternative data attributes
+    css("[data-ved*='lens']"),
+    css("[data-name='lens']"),
+    # Camera/lens icon buttons
+    css("div[role='button'][aria-label*='lens']"),
+    css("div[role='button'][aria-label*='Lens']"),
+    css("div[role='button'][aria-label*='camera']"),
+    css("div[role='button'][aria-label*='Camera']"),
+    # Specific lens button patterns
+    css("div[jsaction*='lens']"),
+    css("div[data-ved][jsaction*='click']"),
+    # Camera icon SVG containers
+    css("div[role='button'] svg[viewBox*='0 0 24 24']"),
+    # Text-based fallbacks
+    contains_text("div[role='button']", "lens"),
+    # Generic button patterns near search box
+    css("div.nDcEnd div[role='button']"),
+    css("div[class*='camera'] div[role='button']"),
+    # Last resort - any element with lens attributes
+    css("*[aria-label*='lens']"),
+    css("*[title*='lens']"),
+    css("*[title*='Lens']"),
+]
+
+IMPORT_OPTION_CANDIDATES = [
+    # Text-based selectors in multiple languages
+    xpath("//span[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'file')]"),
+    xpath("//span[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'upload')]"),
+    xpath("//span[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'import')]"),
+    xpath("//span[contains(text(), 'fichier')]"),     # French
+    xpath("//span[contains(text(), 'Datei')]"),       # German
+    xpath("//span[contains(text(), 'archivo')]"),     # Spanish
+    xpath("//span[contains(text(), 'ficheiro')]"),    # Portuguese
+    xpath("//span[contains(text(), 'bestand')]"),     # Dutch
+    xpath("//span[contains(text(), 'αρχείο')]"),      # Greek
+    xpath("//div[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'upload')]"),
+    xpath("//div[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'file')]"),
+    # Attribute-based selectors
+    xpath("//div[@role='button' and contains(@aria-label, 'upload')]"),
+    xpath("//div[@role='button' and contains(@aria-label, 'file')]"),
+    xpath("//div[@role='button' and contains(@aria-label, 'import')]"),
+    # Input file selectors
+    css("input[type='file']"),
+    css("input[accept*='image']"),
+    # Button patterns
+    contains_text("button[type='button']", "upload"),
+    contains_text("button[type='button']", "file"),
+]
+
 def setup_anti_detection_driver():
     """Create a Chrome driver with comprehensive anti-detection measures"""
     options = webdriver.ChromeOptions()
@@ -236,125 +331,94 @@ def setup_anti_detection_driver():
     
     return driver
 
-def handle_cookie_consent(driver):
+def get_driver_pool():
+    """Return the process-wide driver pool, creating it on first use"""
+    global _driver_pool
+    with _driver_pool_lock:
+        if _driver_pool is None:
+            _driver_pool = DriverPool(
+                factory=setup_anti_detection_driver,
+                size=Config.DRIVER_POOL_SIZE,
+                max_uses=Config.DRIVER_MAX_USES,
+                max_age=Config.DRIVER_MAX_AGE,
+                acquire_timeout=Config.DRIVER_ACQUIRE_TIMEOUT,
+            )
+            logger.info(f"Created driver pool (size={Config.DRIVER_POOL_SIZE})")
+        return _driver_pool
+
+def shutdown_driver_pool():
+    """Quit all pooled browsers"""
+    global _driver_pool
+    with _driver_pool_lock:
+        pool, _driver_pool = _driver_pool, None
+    if pool is not None:
+        logger.info("Closing driver pool...")
+        pool.close()
+
+def handle_cookie_consent(driver, waits=None):
     """Handle cookie consent dialog if present"""
     logger.info("Looking for cookie consent dialog...")
+    waits = waits or WaitEngine(driver)
     try:
-        # Wait for cookie dialog to appear (max 1 second)
-        time.sleep(1)
-        
-        # Try multiple selector approaches to find accept button
-        accept_buttons = driver.find_elements(By.XPATH, "//button[contains(., 'accept') or contains(., 'Accept') or .//span[contains(., 'accept') or contains(., 'Accept')]]")
+        # Wait until either the consent dialog or the search box has rendered
+        waits.until("cookie_consent", CONSENT_OR_SEARCH_READY)
         
-        if not accept_buttons:
-            accept_buttons = driver.find_elements(By.CSS_SELECTOR, "button[id*='consent' i], button[class*='consent' i]")
+        # Probe every accept-button locator in one round trip, historical winners first
+        stats = get_selector_stats()
+        candidates = stats.order("cookie_accept", COOKIE_ACCEPT_CANDIDATES)
+        match = probe_selectors(driver, candidates, "cookie_accept")
         
-        if accept_buttons:
+        if match:
             logger.info("Cookie consent dialog found, clicking accept...")
-            accept_buttons[0].click()
-            time.sleep(0.5)  # Brief pause after clicking
+            match.element.click()
+            stats.record_success("cookie_accept", match.candidate.key, match.elapsed_ms)
+            waits.until("cookie_dismiss", DOM_SETTLED, quiet_ms=Config.WAIT_DOM_QUIET_MS)
         else:
             logger.info("No cookie consent dialog detected")
             
     except Exception as e:
         logger.error(f"Error handling cookie dialog: {e}")
 
-def wait_for_page_load(driver, max_wait=10):
-    """Wait for page to load - simplified and faster version"""
+def wait_for_page_load(driver, max_wait=None, waits=None, phase="page_load"):
+    """Wait until the document is complete, jQuery is idle and the DOM has settled"""
     logger.info("Waiting for page to load...")
-    
-    # First wait for document.readyState to be complete
-    try:
-        WebDriverWait(driver, max_wait).until(
-            lambda d: d.execute_script("return document.readyState") == "complete"
-        )
-        logger.info("Page reached 'complete' state")
-    except Exception as e:
-        logger.warning(f"Page took too long to reach complete state: {e}")
+    waits = waits or WaitEngine(driver)
     
     # Single scroll to trigger any lazy-loading elements
     driver.execute_script("window.scrollBy(0, 300);")
     
-    # Brief pause for any final AJAX content
-    time.sleep(1.5)
-    
-    # Check if jQuery is active (if present)
-    jquery_ready = driver.execute_script("""
-        return (typeof jQuery === 'undefined') || 
-               (jQuery.active === 0 && jQuery.ready.state === 'complete');
-    """)
-    
-    if not jquery_ready:
-        logger.info("Waiting extra time for jQuery requests to complete")
-        time.sleep(1)
+    # Returns as soon as the page is ready instead of sleeping for AJAX content
+    if not waits.page_ready(phase=phase, timeout=max_wait):
+        logger.warning("Page did not settle in time, continuing anyway")
     
     logger.info("Page load wait completed")
 
-def click_lens_button(driver):
+def click_lens_button(driver, waits=None):
     """Find and click the Google Lens button using multiple strategies"""
     logger.info("Looking for Google Lens button...")
-    
-    # Try different selector strategies (in order of preference)
-    selectors = [
-        # Primary selector based on data-attribute
-        "[data-base-lens-url='https://lens.google.com']",
-        # Alternative data attributes
-        "[data-ved*='lens']",
-        "[data-name='lens']",
-        # Button/div with lens in data attributes
-        "[data-*='lens']",
-        # Camera/lens icon buttons
-        "div[role='button'][aria-label*='lens']",
-        "div[role='button'][aria-label*='Lens']", 
-        "div[role='button'][aria-label*='camera']",
-        "div[role='button'][aria-label*='Camera']",
-        # Specific lens button patterns
-        "div[jsaction*='lens']",
-        "div[data-ved][jsaction*='click']",
-        # Camera icon SVG containers
-        "div[role='button'] svg[viewBox*='0 0 24 24']",
-        # Text-based fallbacks
-        "div[role='button']:contains('lens')",
-        "div[role='button']:contains('Lens')",
-        # Generic button patterns near search box
-        "div.nDcEnd div[role='button']",
-        "div[class*='camera'] div[role='button']",
-        # Last resort - any clickable element with lens attributes
-        "*[data-*='lens'][role='button']",
-        "*[aria-label*='lens']",
-        "*[title*='lens']",
-        "*[title*='Lens']"
-    ]
-    
-    for selector in selectors:
+    waits = waits or WaitEngine(driver)
+    
+    # Probe all selector strategies at once (historical winners first),
+    # re-probing on DOM changes until one matches
+    stats = get_selector_stats()
+    candidates = stats.order("lens_button", LENS_BUTTON_CANDIDATES)
+    match = wait_for_probe(waits, "lens_button", candidates)
+    if match:
         try:
-            logger.info(f"Trying selector: {selector}")
-            wait = WebDriverWait(driver, 3)  # Shorter timeout for faster checking
-            
-            # Special handling for :contains() selectors
-            if ':contains(' in selector:
-                elements = driver.execute_script(f"""
-                    return Array.from(document.querySelectorAll('div[role="button"]')).filter(el => 
-                        el.textContent && el.textContent.toLowerCase().includes('lens')
-                    );
-                """)
-                if elements and len(elements) > 0:
-                    lens_button = elements[0]
-                else:
-                    continue
-            else:
-                lens_button = wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, selector)))
-            
             # Move mouse to button before clicking (more human-like)
             action = ActionChains(driver)
-            action.move_to_element(lens_button).pause(0.3).perform()
+            action.move_to_element(match.element).pause(0.3).perform()
             
-            logger.info(f"Found Google Lens button with selector '{selector}', clicking...")
-            lens_button.click()
-            time.sleep(2)  # Wait longer for lens interface to load
+            logger.info(f"Found Google Lens button with {match.candidate.key}, clicking...")
+            match.element.click()
+            if waits.until("lens_open", LENS_UI_OPEN):
+                stats.record_success("lens_button", match.candidate.key, match.elapsed_ms)
+            else:
+                stats.record_failure("lens_button", match.candidate.key)
             return True
         except Exception as e:
-            logger.debug(f"Selector {selector} failed: {e}")
+            stats.record_failure("lens_button", match.candidate.key)
+            logger.debug(f"Clicking probed lens button failed: {e}")
     
     # JavaScript-based fallback approach
     try:
@@ -415,7 +479,7 @@ def click_lens_button(driver):
             action = ActionChains(driver)
             action.move_to_element(lens_button).pause(0.3).perform()
             lens_button.click()
-            time.sleep(2)
+            waits.until("lens_open", LENS_UI_OPEN)
             return True
     except Exception as e:
         logger.debug(f"JavaScript approach failed: {e}")
@@ -432,7 +496,7 @@ def click_lens_button(driver):
                     action = ActionChains(driver)
                     action.move_to_element(button).pause(0.3).perform()
                     button.click()
-                    time.sleep(2)
+                    waits.until("lens_open", LENS_URL_OPEN, timeout=2)
                     
                     # Check if we're now on a lens-like page
                     current_url = driver.current_url
@@ -451,79 +515,42 @@ def click_lens_button(driver):
     logger.error("Could not find Google Lens button with any strategy")
     return False
 
-def find_and_click_import_option(driver):
+def find_and_click_import_option(driver, waits=None):
     """Find and click the import option in Google Lens"""
     logger.info("Looking for import option...")
-    
-    # Wait a moment for Lens page to load
-    time.sleep(3)
-    
-    # Different selectors for the import button/link, ordered by specificity
-    import_selectors = [  
-        # Text-based selectors in multiple languages
-        "//span[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'file')]",
-        "//span[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'upload')]",
-        "//span[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'import')]",
-        "//span[contains(text(), 'fichier')]",     # French  
-        "//span[contains(text(), 'Datei')]",       # German  
-        "//span[contains(text(), 'archivo')]",     # Spanish  
-        "//span[contains(text(), 'ficheiro')]",    # Portuguese  
-        "//span[contains(text(), 'bestand')]",     # Dutch
-        "//span[contains(text(), 'αρχείο')]",      # Greek
-        "//div[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'upload')]",
-        "//div[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'file')]",
-        # Attribute-based selectors
-        "//div[@role='button' and contains(@aria-label, 'upload')]",
-        "//div[@role='button' and contains(@aria-label, 'file')]",
-        "//div[@role='button' and contains(@aria-label, 'import')]",
-        # Input file selectors
-        "input[type='file']",
-        "input[accept*='image']",
-        # Button patterns
-        "div[role='button'][data-*='upload']",
-        "div[role='button'][data-*='file']",
-        "button[type='button']:contains('upload')",
-        "button[type='button']:contains('file')",
-    ]
-    
-    # Try each selector
-    for selector in import_selectors:
+    waits = waits or WaitEngine(driver)
+    
+    # Probe all import locators at once, re-probing until the Lens dialog offers one
+    stats = get_selector_stats()
+    candidates = stats.order("import_option", IMPORT_OPTION_CANDIDATES)
+    match = wait_for_probe(waits, "import_option", candidates)
+    if match:
+        import_element = match.element
         try:
-            logger.info(f"Trying import selector: {selector}")
-            is_xpath = selector.startswith("//")
-            by_method = By.XPATH if is_xpath else By.CSS_SELECTOR
-                
-            # For visible elements
-            try:
-                wait = WebDriverWait(driver, 2)  # Shorter timeout for faster checking
-                import_element = wait.until(EC.element_to_be_clickable((by_method, selector)))
-                
-                logger.info(f"Found import button: '{import_element.text[:50]}...', clicking...")
-                
-                # Move mouse to button before clicking (more human-like)
-                action = ActionChains(driver)
-                action.move_to_element(import_element).pause(0.2).perform()
-                import_element.click()
-                
-                # Wait for file dialog to appear
-                time.sleep(1)
-                
-                # Try to find the file input that might appear after clicking
-                try:
-                    file_input = driver.find_element(By.CSS_SELECTOR, "input[type='file']")
-                    logger.info("Found file input after clicking button")
-                    return file_input
-                except:
-                    # Return the clicked element
-                    logger.info("No file input found after click, returning clicked element")
-                    return import_element
+            logger.info(f"Found import button with {match.candidate.key}: '{import_element.text[:50]}...', clicking...")
             
-            except Exception as e:
-                logger.debug(f"Selector {selector} not clickable: {e}")
-                continue
-                
+            # Move mouse to button before clicking (more human-like)
+            action = ActionChains(driver)
+            action.move_to_element(import_element).pause(0.2).perform()
+            import_element.click()
+            
+            # Wait for file dialog to appear
+            waits.until("file_input", FILE_INPUT_PRESENT)
+            
+            # Try to find the file input that might appear after clicking
+            try:
+                file_input = driver.find_element(By.CSS_SELECTOR, "input[type='file']")
+                logger.info("Found file input after clicking button")
+                stats.record_success("import_option", match.candidate.key, match.elapsed_ms)
+                return file_input
+            except:
+                # Return the clicked element
+                logger.info("No file input found after click, returning clicked element")
+                stats.record_failure("import_option", match.candidate.key)
+                return import_element
         except Exception as e:
-            logger.debug(f"Import selector {selector} failed: {e}")
+            stats.record_failure("import_option", match.candidate.key)
+            logger.debug(f"Clicking probed import element failed: {e}")
     
     # Enhanced JavaScript approach with multiple strategies
     try:
@@ -584,7 +611,7 @@ def find_and_click_import_option(driver):
                     action = ActionChains(driver)
                     action.move_to_element(button).pause(0.2).perform()
                     button.click()
-                    time.sleep(1)
+                    waits.until("file_input", FILE_INPUT_PRESENT)
                     
                     # Try to find file input after click
                     try:
@@ -628,7 +655,7 @@ def find_and_click_import_option(driver):
                         action = ActionChains(driver)
                         action.move_to_element(element).pause(0.2).perform()
                         element.click()
-                        time.sleep(1)
+                        waits.until("file_input", FILE_INPUT_PRESENT)
                         
                         # Check if file input appeared
                         try:
@@ -648,7 +675,7 @@ def find_and_click_import_option(driver):
     logger.error("Could not find import option with any strategy")
     return None
 
-def upload_image(driver, file_element, image_path):
+def upload_image(driver, file_element, image_path, waits=None):
     """Upload an image file using the provided element"""
     if file_element is None:
         logger.error("No file input element found")
@@ -669,7 +696,7 @@ def upload_image(driver, file_element, image_path):
         else:
             logger.info("Element is not a file input, trying to find one after clicking")
             file_element.click()
-            time.sleep(1)
+            (waits or WaitEngine(driver)).until("file_input", FILE_INPUT_PRESENT)
             
             try:
                 file_input = driver.find_element(By.CSS_SELECTOR, "input[type='file']")
@@ -684,100 +711,143 @@ def upload_image(driver, file_element, image_path):
         logger.error(f"Error uploading image: {e}")
         return False
         
-def extract_links_and_descriptions(driver, csv_path):
-    """Extract all non-Google links and their descriptions from the page"""
-    logger.info("Extracting links and descriptions...")
-    
-    # Use a raw string for the JavaScript to avoid Python escape sequence warnings
-    links_with_desc = driver.execute_script(r"""
-        let results = [];
+class LensSearchError(Exception):
+    """Raised when the Lens flow fails before any results could be extracted"""
+
+# Domains whose links are never treated as results
+GOOGLE_DOMAINS = [
+    'google.com', 'gstatic.com', 'googleapis.com', 'chrome.com',
+    'google.co', 'googleusercontent.com'
+]
+
+# Collects every http(s) link on the page with a description, plus a count of
+# candidate elements used to detect when the results stop changing
+COLLECT_LINKS_SCRIPT = r"""
+    let results = [];
+    
+    // Get all <a> tags on the page
+    let elements = document.getElementsByTagName('a');
+    for (let i = 0; i < elements.length; i++) {
+        let link = elements[i];
+        let href = link.getAttribute('href');
         
-        // Get all <a> tags on the page
-        let elements = document.getElementsByTagName('a');
-        for (let i = 0; i < elements.length; i++) {
-            let link = elements[i];
-            let href = link.getAttribute('href');
+        if (href && href.startsWith('http')) {
+            let description = '';
             
-            if (href && href.startsWith('http')) {
-                let description = '';
-                
-                // Try to get text directly from the link
-                if (link.textContent && link.textContent.trim()) {
-                    description = link.textContent.trim();
-                }
-                // Or from parent element if link has no text
-                else if (link.parentElement && link.parentElement.textContent) {
-                    description = link.parentElement.textContent.trim();
-                }
-                
-                results.push({
-                    url: href,
-                    description: description
-                });
+            // Try to get text directly from the link
+            if (link.textContent && link.textContent.trim()) {
+                description = link.textContent.trim();
             }
-        }
-        
-        // Get links from elements that might be clickable but not <a> tags
-        elements = document.querySelectorAll('[onclick], [data-url]');
-        for (let i = 0; i < elements.length; i++) {
-            let el = elements[i];
-            let href = null;
-            
-            // Check onclick attribute
-            if (el.hasAttribute('onclick')) {
-                let onclick = el.getAttribute('onclick');
-                if (onclick && onclick.includes('http')) {
-                    let match = onclick.match(/(https?:\/\/[^'"\s]+)/g);
-                    if (match) href = match[0];
-                }
+            // Or from parent element if link has no text
+            else if (link.parentElement && link.parentElement.textContent) {
+                description = link.parentElement.textContent.trim();
             }
             
-            // Check data-url attribute
-            if (!href && el.hasAttribute('data-url')) {
-                let dataUrl = el.getAttribute('data-url');
-                if (dataUrl && dataUrl.startsWith('http')) {
-                    href = dataUrl;
-                }
+            results.push({
+                url: href,
+                description: description
+            });
+        }
+    }
+    
+    // Get links from elements that might be clickable but not <a> tags
+    elements = document.querySelectorAll('[onclick], [data-url]');
+    for (let i = 0; i < elements.length; i++) {
+        let el = elements[i];
+        let href = null;
+        
+        // Check onclick attribute
+        if (el.hasAttribute('onclick')) {
+            let onclick = el.getAttribute('onclick');
+            if (onclick && onclick.includes('http')) {
+                let match = onclick.match(/(https?:\/\/[^'"\s]+)/g);
+                if (match) href = match[0];
             }
-            
-            if (href) {
-                // Get text from the element
-                let description = el.textContent ? el.textContent.trim() : '';
-                results.push({
-                    url: href,
-                    description: description
-                });
+        }
+        
+        // Check data-url attribute
+        if (!href && el.hasAttribute('data-url')) {
+            let dataUrl = el.getAttribute('data-url');
+            if (dataUrl && dataUrl.startsWith('http')) {
+                href = dataUrl;
             }
         }
         
-        return results;
-    """)
-    
-    # Filter out Google domains
-    filtered_results = [
-        item for item in links_with_desc 
-        if not any(domain in item['url'] for domain in [
-            'google.com', 'gstatic.com', 'googleapis.com', 'chrome.com',
-            'google.co', 'googleusercontent.com'
-        ])
-    ]
-    
-    logger.info(f"Found {len(filtered_results)} unique external links")
-    
-    # Write results to CSV
-    with open(csv_path, 'w', newline='', encoding='utf-8') as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(['URL', 'Description'])  # Header with both columns
-        for item in filtered_results:
-            writer.writerow([item['url'], item['description']])
+        if (href) {
+            // Get text from the element
+            let description = el.textContent ? el.textContent.trim() : '';
+            results.push({
+                url: href,
+                description: description
+            });
+        }
+    }
     
-    logger.info(f"All links saved to {csv_path}")
-    return filtered_results
+    return {count: document.querySelectorAll('a[href], [onclick], [data-url]').length, links: results};
+"""
+
+def iter_links_and_descriptions(driver, waits=None, max_links=None, stable_for=None, max_wait=None):
+    """Yield non-Google links as LensResult records as they appear on the results page.
+
+    Stops as soon as max_links distinct links have been found, when the page has
+    not gained any candidate elements for stable_for seconds, or after max_wait.
+    """
+    waits = waits or WaitEngine(driver)
+    if max_links is None:
+        max_links = Config.MAX_URLS_TO_SCRAPE
+    if stable_for is None:
+        stable_for = Config.RESULTS_STABLE_SECONDS
+    if max_wait is None:
+        max_wait = Config.RESULTS_MAX_WAIT
+    
+    logger.info("Extracting links and descriptions incrementally...")
+    deadline = time.monotonic() + max_wait
+    seen = set()
+    
+    while True:
+        snapshot = driver.execute_script(COLLECT_LINKS_SCRIPT)
+        for item in snapshot['links']:
+            url = item['url']
+            if url in seen or any(domain in url for domain in GOOGLE_DOMAINS):
+                continue
+            yield LensResult.from_link(url, item['description'], len(seen))
+            seen.add(url)
+            if max_links and len(seen) >= max_links:
+                logger.info(f"Found {len(seen)} external links, stopping early")
+                return
+        
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            logger.info(f"Result extraction hit its {max_wait}s bound with {len(seen)} links")
+            return
+        
+        # Sleep until the page gains new candidate elements; no change means the results are complete
+        changed = waits.until(
+            "results_more",
+            f"return document.querySelectorAll('a[href], [onclick], [data-url]').length !== {snapshot['count']};",
+            timeout=min(stable_for, remaining),
+        )
+        if not changed:
+            logger.info(f"Result links stable at {len(seen)} external links")
+            return
+
+def stream_google_lens_search(image_path, csv_path=None):
+    """Run a Google Lens search and yield LensResult records as they are found.
+
+    The pooled browser is held until the generator finishes or is closed, so callers
+    that stop early should close it. Raises LensSearchError if the flow fails before
+    results are available. If csv_path is given, the results are also written there.
+    """
+    pool = get_driver_pool()
+    try:
+        pooled = pool.acquire()
+    except Exception as e:
+        raise LensSearchError(f"Could not get a browser from the pool: {e}") from e
+    driver = pooled.driver
+    waits = WaitEngine(driver)
+    healthy = False
+    found = []
 
-def run_google_lens_search(image_path, csv_path):
-    """Run a Google Lens search with the provided image and save results to CSV"""
-    driver = setup_anti_detection_driver()
-    
     try:
         # Start at Google.com
         url = "https://www.google.com"
@@ -785,46 +855,65 @@ def run_google_lens_search(image_path, csv_path):
         driver.get(url)
         
         # Handle cookie consent dialog
-        handle_cookie_consent(driver)
+        handle_cookie_consent(driver, waits=waits)
         
         # Set window size
         driver.set_window_size(1366, 768)
         
         # Wait for page to load completely
-        wait_for_page_load(driver)
+        wait_for_page_load(driver, waits=waits, phase="home_load")
         
         # Click on Google Lens button
-        if not click_lens_button(driver):
-            logger.error("Failed to access Google Lens - aborting")
-            return False
+        if not click_lens_button(driver, waits=waits):
+            healthy = True
+            raise LensSearchError("Failed to access Google Lens")
             
         # Wait for Google Lens interface to load
-        wait_for_page_load(driver)
+        wait_for_page_load(driver, waits=waits, phase="lens_load")
         
         # Find and click import option
-        file_input = find_and_click_import_option(driver)
+        file_input = find_and_click_import_option(driver, waits=waits)
         
         # Upload image file
-        if not upload_image(driver, file_input, image_path):
-            logger.error("Failed to upload image - aborting")
-            return False
+        if not upload_image(driver, file_input, image_path, waits=waits):
+            healthy = True
+            raise LensSearchError("Failed to upload image")
         
-        # Wait for search results to load
+        # Wait for the first external result link, then extract incrementally
         logger.info("Waiting for search results...")
-        time.sleep(5)  # Initial wait
-        wait_for_page_load(driver)
+        waits.until("results", EXTERNAL_LINKS_PRESENT)
         
-        # Extract all links and descriptions
-        extract_links_and_descriptions(driver, csv_path)
-        return True
+        for result in iter_links_and_descriptions(driver, waits=waits):
+            found.append(result)
+            yield result
+        healthy = True
         
+    except GeneratorExit:
+        # The consumer has enough links; the browser is still fine
+        healthy = True
+        raise
+    finally:
+        if csv_path and found:
+            write_results_csv(csv_path, found)
+        logger.info(f"Lens flow waits: {waits.summary()}")
+        # Hand the browser back to the pool; drivers that raised are discarded
+        logger.info("Returning browser to pool...")
+        pool.release(pooled, discard=not healthy)
+
+def run_google_lens_search(image_path, csv_path):
+    """Run a Google Lens search with the provided image and save results to CSV"""
+    try:
+        links = list(stream_google_lens_search(image_path))
+    except LensSearchError as e:
+        logger.error(f"{e} - aborting")
+        return False
     except Exception as e:
         logger.error(f"Error in Google Lens search: {e}")
         return False
-    finally:
-        # Always close the driver
-        logger.info("Closing browser...")
-        driver.quit()
+    
+    logger.info(f"Found {len(links)} unique external links")
+    write_results_csv(csv_path, links)
+    return True
 
 # Module can be run independently
 if __name__ == "__main__":
@@ -850,7 +939,9 @@ if __name__ == "__main__":
     # Run search
     logger.info(f"Running Google Lens search on {args.image}")
     success = run_google_lens_search(args.image, args.output)
-    
+    shutdown_driver_pool()
+    get_selector_stats().flush()
+
     if success:
         logger.info(f"Success! Results saved to {args.output}")
     else:
@@ -0,0 +1,41 @@
+"""
+Coalescing of identical in-flight work.
+
+Concurrent calls with the same key share one running task: the first caller
+starts it, later callers wait for the same result. The task is shielded, so a
+caller that gives up (e.g. a disconnected client) does not cancel it for the rest.
+"""
+import asyncio
+import logging
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """Map of key -> running task and the id of the caller that started it"""
+
+    def __init__(self):
+        self._flights = {}
+        self._coalesced = 0
+
+    async def do(self, key, owner, func):
+        """Await func() once per key; returns (result, owner of the flight that produced it)"""
+        flight = self._flights.get(key)
+        if flight is None:
+            task = asyncio.create_task(func())
+            flight = self._flights[key] = (task, owner)
+            task.add_done_callback(lambda _: self._flights.pop(key, None))
+        else:
+            self._coalesced += 1
+            logger.info(f"Request {owner} joined in-flight request {flight[1]}")
+        task, leader = flight
+        return await asyncio.shield(task), leader
+
+    def leader(self, key):
+        """Owner of the flight running for key, or None"""
+        flight = self._flights.get(key)
+        return flight[1] if flight else None
+
+    def stats(self):
+        return {"in_flight": len(self._flights), "coalesced": self._coalesced}
@@ -0,0 +1,173 @@
+"""
+Disk-backed memoization of pipeline stage outputs.
+
+Entries are keyed by content hashes (the image's SHA-256 for the Lens and scrape
+stages, a hash of text, model and prompt for the LLM stage), so a re-submitted
+photo skips the stages whose inputs have not changed. Values are stored as JSON in
+a small SQLite database that survives restarts; each stage has its own TTL and
+entry limit, with least-recently-used entries evicted first.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from config import Config
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+_stage_cache = None
+_stage_cache_lock = threading.Lock()
+
+
+def content_key(*parts):
+    """SHA-256 over the given parts, used to build cache keys"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class StageCache:
+    """SQLite store of per-stage results with TTL and size-bounded eviction"""
+
+    def __init__(self, path, ttls, max_entries):
+        self.path = path
+        self.ttls = dict(ttls)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._hits = {}
+        self._misses = {}
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " stage TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+            " created REAL NOT NULL, accessed REAL NOT NULL,"
+            " PRIMARY KEY (stage, key))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (stage, accessed)")
+        self._conn.commit()
+
+    def get(self, stage, key):
+        """Return the cached value, or None if missing or expired"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created FROM entries WHERE stage = ? AND key = ?", (stage, key)
+            ).fetchone()
+            if row is not None and now - row[1] > self.ttls.get(stage, 0):
+                self._conn.execute("DELETE FROM entries WHERE stage = ? AND key = ?", (stage, key))
+                self._conn.commit()
+                row = None
+            if row is None:
+                self._misses[stage] = self._misses.get(stage, 0) + 1
+                return None
+            self._conn.execute(
+                "UPDATE entries SET accessed = ? WHERE stage = ? AND key = ?", (now, stage, key)
+            )
+            self._conn.commit()
+            self._hits[stage] = self._hits.get(stage, 0) + 1
+        logger.info(f"Stage cache hit for {stage} ({key[:12]})")
+        return json.loads(row[0])
+
+    def put(self, stage, key, value):
+        now = time.time()
+        data = json.dumps(value)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (stage, key, value, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (stage, key, data, now, now),
+            )
+            # Evict the least recently used entries beyond the stage's limit
+            self._conn.execute(
+                "DELETE FROM entries WHERE stage = ? AND key NOT IN ("
+                " SELECT key FROM entries WHERE stage = ? ORDER BY accessed DESC LIMIT ?)",
+                (stage, stage, self.max_entries),
+            )
+            self._conn.commit()
+
+    def live_keys(self, stage):
+        """Keys of the stage's entries that have not expired"""
+        cutoff = time.time() - self.ttls.get(stage, 0)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key FROM entries WHERE stage = ? AND created >= ?", (stage, cutoff)
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def purge_expired(self):
+        now = time.time()
+        with self._lock:
+            for stage, ttl in self.ttls.items():
+                self._conn.execute("DELETE FROM entries WHERE stage = ? AND created < ?", (stage, now - ttl))
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT stage, COUNT(*) FROM entries GROUP BY stage").fetchall())
+            return {
+                stage: {
+                    "entries": counts.get(stage, 0),
+                    "hits": self._hits.get(stage, 0),
+                    "misses": self._misses.get(stage, 0),
+                    "ttl": ttl,
+                }
+                for stage, ttl in self.ttls.items()
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class _DisabledCache:
+    """Stand-in used when STAGE_CACHE_ENABLED is off"""
+
+    def get(self, stage, key):
+        return None
+
+    def put(self, stage, key, value):
+        pass
+
+    def live_keys(self, stage):
+        return set()
+
+    def purge_expired(self):
+        pass
+
+    def stats(self):
+        return {}
+
+    def close(self):
+        pass
+
+
+def get_stage_cache():
+    """Return the process-wide stage cache, opening it on first use"""
+    global _stage_cache
+    with _stage_cache_lock:
+        if _stage_cache is None:
+            if Config.STAGE_CACHE_ENABLED:
+                _stage_cache = StageCache(
+                    path=Config.STAGE_CACHE_PATH,
+                    ttls=Config.STAGE_CACHE_TTLS,
+                    max_entries=Config.STAGE_CACHE_MAX_ENTRIES,
+                )
+                _stage_cache.purge_expired()
+                logger.info(f"Opened stage cache at {Config.STAGE_CACHE_PATH}")
+            else:
+                _stage_cache = _DisabledCache()
+        return _stage_cache
+
+
+def close_stage_cache():
+    global _stage_cache
+    with _stage_cache_lock:
+        cache, _stage_cache = _stage_cache, None
+    if cache is not None:
+        cache.close()
@@ -0,0 +1,121 @@
+"""
+Bounded executors for the blocking pipeline stages.
+
+The FastAPI handlers are async, but Selenium, page scraping and the OpenAI client
+are blocking. Each stage gets its own thread pool so the event loop stays free
+and the stages can be sized independently (e.g. a few browsers, more scrapers).
+"""
+import asyncio
+import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+_stage_executors = None
+_stage_executors_lock = threading.Lock()
+
+
+class StageExecutors:
+    """One bounded ThreadPoolExecutor per named stage"""
+
+    def __init__(self, sizes):
+        self._executors = {
+            stage: ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix=f"stage-{stage}")
+            for stage, workers in sizes.items()
+        }
+        self._sizes = dict(sizes)
+        self._active = {stage: 0 for stage in sizes}
+        self._waiting = {stage: 0 for stage in sizes}
+        self._lock = threading.Lock()
+
+    def run(self, stage, func, *args, **kwargs):
+        """Run func on the stage's pool and return an awaitable for its result"""
+        executor = self._executors[stage]
+        with self._lock:
+            self._waiting[stage] += 1
+
+        def tracked():
+            with self._lock:
+                self._waiting[stage] -= 1
+                self._active[stage] += 1
+            try:
+                return func(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._active[stage] -= 1
+
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(executor, tracked)
+
+    def stats(self):
+        with self._lock:
+            return {
+                stage: {"workers": self._sizes[stage], "active": self._active[stage], "waiting": self._waiting[stage]}
+                for stage in self._sizes
+            }
+
+    def shutdown(self):
+        for executor in self._executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+class Channel:
+    """Thread-safe hand-off of items from a producer stage to a consumer stage.
+
+    The producer calls put() for each item and finish() at the end (with the
+    exception if it failed). The consumer iterates the channel and may call
+    close() to tell the producer to stop early; put() then returns False.
+    """
+
+    _END = object()
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._closed = threading.Event()
+
+    def put(self, item):
+        if self._closed.is_set():
+            return False
+        self._queue.put(item)
+        return True
+
+    def finish(self, error=None):
+        self._queue.put((self._END, error))
+
+    def close(self):
+        self._closed.set()
+
+    @property
+    def closed(self):
+        return self._closed.is_set()
+
+    def __iter__(self):
+        while True:
+            item = self._queue.get()
+            if isinstance(item, tuple) and len(item) == 2 and item[0] is self._END:
+                if item[1] is not None:
+                    raise item[1]
+                return
+            yield item
+
+
+def get_stage_executors():
+    """Return the process-wide stage executors, creating them on first use"""
+    global _stage_executors
+    with _stage_executors_lock:
+        if _stage_executors is None:
+            _stage_executors = StageExecutors(Config.STAGE_WORKERS)
+            logger.info(f"Created stage executors: {Config.STAGE_WORKERS}")
+        return _stage_executors
+
+
+def shutdown_stage_executors():
+    global _stage_executors
+    with _stage_executors_lock:
+        executors, _stage_executors = _stage_executors, None
+    if executors is not None:
+        executors.shutdown()
@@ -0,0 +1,177 @@
+"""
+Structured product data from JSON-LD and OpenGraph tags.
+
+For resale pricing most of what matters on a product page is in its
+<script type="application/ld+json"> Product/Offer block and its og:/product:
+meta tags. Both can be found with a few regular expressions over the raw bytes,
+without building a DOM: meta tags are only looked for in the document head and
+only the JSON-LD script bodies are decoded and parsed. When a page has a product
+name and price, the compact record built here replaces the page's body text.
+"""
+import html
+import json
+import logging
+import re
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+HEAD_SCAN_BYTES = 128 * 1024  # where to look for meta tags if </head> is missing
+
+_HEAD_END = re.compile(rb'</head\s*>|<body[\s>]', re.IGNORECASE)
+_JSON_LD = re.compile(
+    rb'<script[^>]+type\s*=\s*["\']?application/ld\+json["\']?[^>]*>(.*?)</script\s*>',
+    re.IGNORECASE | re.DOTALL,
+)
+_META = re.compile(rb'<meta\s[^>]*>', re.IGNORECASE)
+_ATTRIBUTE = re.compile(rb'([a-zA-Z:_-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s"\'>]+))')
+
+FIELDS = ['name', 'brand', 'price', 'currency', 'condition']
+
+# og:/product: meta properties for each field, in order of preference
+META_FIELDS = {
+    'name': ['og:title', 'twitter:title'],
+    'brand': ['product:brand', 'og:brand'],
+    'price': ['product:price:amount', 'og:price:amount', 'product:sale_price:amount'],
+    'currency': ['product:price:currency', 'og:price:currency', 'product:sale_price:currency'],
+    'condition': ['product:condition', 'og:condition'],
+}
+
+
+def _decode(raw, encoding):
+    try:
+        return raw.decode(encoding, errors='replace')
+    except LookupError:
+        return raw.decode('utf-8', errors='replace')
+
+
+def _types(node):
+    types = node.get('@type', [])
+    return types if isinstance(types, list) else [types]
+
+
+def _find_product(node):
+    """Depth-first search of a JSON-LD document for a Product node"""
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(reversed(node))
+        elif isinstance(node, dict):
+            if any(t in ('Product', 'ProductGroup', 'IndividualProduct') for t in _types(node)):
+                return node
+            stack.extend(reversed(list(node.values())))
+    return None
+
+
+def _name(value):
+    """A schema.org Thing or a plain string -> its name"""
+    if isinstance(value, list):
+        value = value[0] if value else None
+    if isinstance(value, dict):
+        value = value.get('name')
+    return str(value).strip() if value not in (None, '') else None
+
+
+def _condition(value):
+    """https://schema.org/UsedCondition -> Used"""
+    if not value:
+        return None
+    value = str(value).rstrip('/').rsplit('/', 1)[-1]
+    value = re.sub(r'Condition$', '', value)
+    return value.capitalize() if value else None
+
+
+def _offer(offers):
+    """(price, currency, condition) of the first offer that has a price"""
+    if isinstance(offers, dict):
+        offers = [offers]
+    for offer in offers if isinstance(offers, list) else []:
+        if not isinstance(offer, dict):
+            continue
+        spec = offer.get('priceSpecification')
+        if isinstance(spec, list):
+            spec = spec[0] if spec else None
+        spec = spec if isinstance(spec, dict) else {}
+        price = offer.get('price', spec.get('price'))
+        if price in (None, '') and offer.get('lowPrice') not in (None, ''):
+            price = offer['lowPrice']
+            if offer.get('highPrice') not in (None, '', price):
+                price = f"{price}-{offer['highPrice']}"
+        if price in (None, ''):
+            continue
+        currency = offer.get('priceCurrency') or spec.get('priceCurrency')
+        return str(price), currency, _condition(offer.get('itemCondition'))
+    return None, None, None
+
+
+def _from_json_ld(body, encoding):
+    for match in _JSON_LD.finditer(body):
+        try:
+            document = json.loads(_decode(match.group(1), encoding), strict=False)
+        except ValueError:
+            continue
+        product = _find_product(document)
+        if product is None:
+            continue
+        price, currency, condition = _offer(product.get('offers'))
+        return {
+            'name': _name(product.get('name')),
+            'brand': _name(product.get('brand')) or _name(product.get('manufacturer')),
+            'price': price,
+            'currency': currency,
+            'condition': condition or _condition(product.get('itemCondition')),
+        }
+    return {}
+
+
+def _from_meta(body, encoding):
+    match = _HEAD_END.search(body, 0, HEAD_SCAN_BYTES)
+    head = body[:match.start() if match else HEAD_SCAN_BYTES]
+    properties = {}
+    for tag in _META.finditer(head):
+        attributes = {}
+        for name, double, single, bare in _ATTRIBUTE.findall(tag.group(0)):
+            attributes[name.lower()] = double or single or bare
+        key = attributes.get(b'property') or attributes.get(b'name')
+        content = attributes.get(b'content')
+        if key and content:
+            properties.setdefault(key.decode('ascii', errors='ignore').lower(), content)
+    record = {}
+    for field, keys in META_FIELDS.items():
+        for key in keys:
+            if key in properties:
+                record[field] = html.unescape(_decode(properties[key], encoding)).strip()
+                break
+    return record
+
+
+def extract_product(body, encoding='utf-8'):
+    """Product name, brand, price, currency and condition of a page, or None.
+
+    JSON-LD is preferred and og:/product: meta tags fill in the gaps. A page
+    without both a name and a price is not treated as a product page.
+    """
+    if isinstance(body, str):
+        body, encoding = body.encode('utf-8'), 'utf-8'
+    product = _from_json_ld(body, encoding)
+    for field, value in _from_meta(body, encoding).items():
+        if not product.get(field):
+            product[field] = value
+    if not product.get('name') or not product.get('price'):
+        return None
+    return {field: product[field] for field in FIELDS if product.get(field)}
+
+
+def format_product(product):
+    """Compact one-line record of a product for the LLM context"""
+    price = product['price']
+    if product.get('currency'):
+        price = f"{price} {product['currency']}"
+    parts = [f"Product: {product['name']}"]
+    if product.get('brand'):
+        parts.append(f"Brand: {product['brand']}")
+    parts.append(f"Price: {price}")
+    if product.get('condition'):
+        parts.append(f"Condition: {product['condition']}")
+    return ' | '.join(parts)
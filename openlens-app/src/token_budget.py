@@ -0,0 +1,89 @@
+"""
+Token budget for the scraped text sent to the LLM.
+
+The scraper and the LLM client both size their work from the same budget: the
+model's context window minus the system prompt, MAX_TOKENS for the answer and a
+safety margin, capped at MAX_INPUT_TOKENS to bound cost. The scraper gets it in
+characters (it cuts excerpts before any tokenizer sees them) using
+CHARS_PER_TOKEN, and each source gets 1/CONTEXT_SOURCES of it. The LLM client
+then trims the assembled text to the exact token budget. Tokens are counted with
+tiktoken when it is installed, otherwise estimated from the character count.
+"""
+import functools
+import logging
+from dataclasses import dataclass
+from config import Config
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+
+@functools.lru_cache(maxsize=None)
+def _encoding(model):
+    """tiktoken encoding for model, or None to fall back to estimates"""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        # The BPE files are downloaded on first use, which can fail offline
+        logger.warning(f"Could not load a tokenizer for {model}, estimating tokens: {e}")
+        return None
+
+
+def count_tokens(text, model=None):
+    encoding = _encoding(model or Config.MODEL)
+    if encoding is None:
+        return -(-len(text) // Config.CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text, max_tokens, model=None):
+    """The longest prefix of text that fits in max_tokens"""
+    encoding = _encoding(model or Config.MODEL)
+    if encoding is None:
+        return text[:max_tokens * Config.CHARS_PER_TOKEN]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+
+def context_window(model):
+    """Context size of model in tokens; dated variants match their base name"""
+    for name in sorted(Config.MODEL_CONTEXT_TOKENS, key=len, reverse=True):
+        if model.startswith(name):
+            return Config.MODEL_CONTEXT_TOKENS[name]
+    return Config.DEFAULT_CONTEXT_TOKENS
+
+
+@dataclass(frozen=True, slots=True)
+class ContextBudget:
+    """How much scraped text a request can use, for one model and prompt"""
+    model: str
+    content_tokens: int  # scraped text sent to the model
+
+    @property
+    def char_limit(self):
+        return self.content_tokens * Config.CHARS_PER_TOKEN
+
+    def source_char_limit(self, char_limit=None):
+        """Characters to extract from one source when the whole text is cut to char_limit"""
+        char_limit = self.char_limit if char_limit is None else char_limit
+        return max(Config.MIN_SOURCE_TOKENS * Config.CHARS_PER_TOKEN, char_limit // Config.CONTEXT_SOURCES)
+
+
+def context_budget(model=None, system_prompt=None, max_tokens=None):
+    """Token budget for the scraped text sent to model with system_prompt"""
+    model = model or Config.MODEL
+    system_prompt = Config.SYSTEM_PROMPT if system_prompt is None else system_prompt
+    max_tokens = Config.MAX_TOKENS if max_tokens is None else max_tokens
+    available = (
+        context_window(model) - count_tokens(system_prompt, model) - max_tokens - Config.CONTEXT_MARGIN_TOKENS
+    )
+    return ContextBudget(model=model, content_tokens=max(0, min(Config.MAX_INPUT_TOKENS, available)))
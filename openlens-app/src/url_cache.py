@@ -0,0 +1,234 @@
+"""
+Cross-request cache of text extracted from scraped pages.
+
+The same retailer and marketplace listings show up for many different images.
+Extracted text is kept per URL in SQLite, fronted by an in-memory LRU. Within
+URL_CACHE_TTL an entry is used as is; after that it is revalidated with
+If-None-Match / If-Modified-Since, so an unchanged page costs a 304 instead of a
+download and parse. Entries older than URL_CACHE_MAX_AGE are dropped.
+"""
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from config import Config
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+_url_cache = None
+_url_cache_lock = threading.Lock()
+
+
+@dataclass(slots=True)
+class CachedPage:
+    url: str
+    text: str
+    char_limit: int      # the excerpt was cut at this many characters
+    etag: str
+    last_modified: str
+    fetched_at: float
+    size: int            # bytes downloaded to produce the text
+
+    def covers(self, char_limit):
+        """True if the stored excerpt is long enough for char_limit"""
+        return self.char_limit >= char_limit or len(self.text) < self.char_limit
+
+    def validators(self):
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class UrlCache:
+    """URL -> extracted text, in SQLite with an in-memory LRU in front.
+
+    Lookups and counters are served under a lock; writes are queued to a
+    background writer thread with its own connection, so callers (future
+    callbacks, the fetcher loop) never wait on SQLite.
+    """
+
+    def __init__(self, path, ttl, max_age, max_entries, memory_entries):
+        self.path = path
+        self.ttl = ttl
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "revalidated": 0, "misses": 0, "stores": 0, "bytes_saved": 0}
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._writer_conn = self._connect()
+        self._writer_conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " url TEXT PRIMARY KEY, text TEXT NOT NULL, char_limit INTEGER NOT NULL,"
+            " etag TEXT, last_modified TEXT, fetched_at REAL NOT NULL, size INTEGER NOT NULL,"
+            " accessed REAL NOT NULL)"
+        )
+        self._writer_conn.execute("CREATE INDEX IF NOT EXISTS pages_accessed ON pages (accessed)")
+        self._writer_conn.execute("DELETE FROM pages WHERE fetched_at < ?", (time.time() - max_age,))
+        self._writer_conn.commit()
+        self._entries = self._writer_conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+        self._conn = self._connect()  # read connection, used under self._lock
+        self._writes = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name="url-cache-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        # WAL lets lookups read while the writer commits; synchronous=NORMAL skips the fsync per commit
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _remember(self, entry):
+        self._memory[entry.url] = entry
+        self._memory.move_to_end(entry.url)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def lookup(self, url):
+        """Return the cached entry for url (fresh or not), or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(url)
+            if entry is None:
+                row = self._conn.execute(
+                    "SELECT url, text, char_limit, etag, last_modified, fetched_at, size FROM pages WHERE url = ?",
+                    (url,),
+                ).fetchone()
+                if row is not None:
+                    entry = CachedPage(*row)
+            if entry is not None and now - entry.fetched_at > self.max_age:
+                self._memory.pop(url, None)
+                entry = None
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+            self._remember(entry)
+            return entry
+
+    def is_fresh(self, entry):
+        return time.time() - entry.fetched_at <= self.ttl
+
+    def record_hit(self, entry):
+        with self._lock:
+            self._counters["hits"] += 1
+            self._counters["bytes_saved"] += entry.size
+
+    def record_miss(self):
+        """An entry was found but not used (too short for the budget, or stale and refetched)"""
+        with self._lock:
+            self._counters["misses"] += 1
+
+    def revalidated(self, entry):
+        """The server answered 304: the entry is fresh again"""
+        entry.fetched_at = time.time()
+        with self._lock:
+            self._counters["revalidated"] += 1
+            self._counters["bytes_saved"] += entry.size
+            self._remember(entry)
+        self._writes.put((
+            "UPDATE pages SET fetched_at = ?, accessed = ? WHERE url = ?",
+            (entry.fetched_at, entry.fetched_at, entry.url),
+        ))
+
+    def store(self, url, text, char_limit, etag, last_modified, size):
+        entry = CachedPage(url, text, char_limit, etag or "", last_modified or "", time.time(), size)
+        with self._lock:
+            self._counters["stores"] += 1
+            self._remember(entry)
+        self._writes.put((
+            "INSERT OR REPLACE INTO pages (url, text, char_limit, etag, last_modified, fetched_at, size, accessed)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (url, text, char_limit, entry.etag, entry.last_modified, entry.fetched_at, size, entry.fetched_at),
+        ))
+
+    def _write_loop(self):
+        """Apply queued writes in batches, one commit per batch"""
+        conn = self._writer_conn
+        while True:
+            batch = [self._writes.get()]
+            while len(batch) < 100:
+                try:
+                    batch.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in batch
+            try:
+                for write in batch:
+                    if write is None:
+                        continue
+                    sql, params = write
+                    new_row = sql.startswith("INSERT") and conn.execute(
+                        "SELECT 1 FROM pages WHERE url = ?", (params[0],)
+                    ).fetchone() is None
+                    conn.execute(sql, params)
+                    self._entries += new_row
+                if self._entries > self.max_entries:
+                    self._evict(conn)
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"URL cache write failed: {e}")
+            if stop:
+                conn.close()
+                return
+
+    def _evict(self, conn):
+        """Drop the least recently stored or revalidated pages, a tenth of the cache at a time"""
+        excess = self._entries - self.max_entries + max(1, self.max_entries // 10)
+        conn.execute(
+            "DELETE FROM pages WHERE url IN (SELECT url FROM pages ORDER BY accessed LIMIT ?)",
+            (excess,),
+        )
+        self._entries = conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+        logger.info(f"Evicted {excess} pages from the URL cache")
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            counters["memory_entries"] = len(self._memory)
+        lookups = counters["hits"] + counters["revalidated"] + counters["misses"]
+        counters["hit_ratio"] = round((counters["hits"] + counters["revalidated"]) / lookups, 3) if lookups else 0.0
+        counters["entries"] = self._entries
+        counters["pending_writes"] = self._writes.qsize()
+        return counters
+
+    def close(self):
+        self._writes.put(None)
+        self._writer.join(timeout=5)
+        with self._lock:
+            self._conn.close()
+
+
+def get_url_cache():
+    """Return the process-wide URL cache, or None if it is disabled"""
+    global _url_cache
+    if not Config.URL_CACHE_ENABLED:
+        return None
+    with _url_cache_lock:
+        if _url_cache is None:
+            _url_cache = UrlCache(
+                path=Config.URL_CACHE_PATH,
+                ttl=Config.URL_CACHE_TTL,
+                max_age=Config.URL_CACHE_MAX_AGE,
+                max_entries=Config.URL_CACHE_MAX_ENTRIES,
+                memory_entries=Config.URL_CACHE_MEMORY_ENTRIES,
+            )
+            logger.info(f"Opened URL cache at {Config.URL_CACHE_PATH}")
+        return _url_cache
+
+
+def close_url_cache():
+    global _url_cache
+    with _url_cache_lock:
+        cache, _url_cache = _url_cache, None
+    if cache is not None:
+        cache.close()
@@ -0,0 +1,159 @@
+"""
+Event-driven waits for the Google Lens flow.
+
+Instead of sleeping for fixed amounts of time, each phase waits on a concrete DOM
+condition. The condition is evaluated inside the page by a MutationObserver-backed
+promise (via execute_async_script), so the wait ends as soon as the page is ready
+and never runs longer than the phase's upper bound.
+"""
+import logging
+import time
+from config import Config
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Extra seconds given to the WebDriver script timeout on top of the phase bound
+SCRIPT_TIMEOUT_MARGIN = 5
+
+# Consecutive script errors tolerated (e.g. the document unloaded during navigation)
+MAX_SCRIPT_ERRORS = 3
+
+# Shared JavaScript conditions. Each is the body of a function returning a truthy value when met.
+PAGE_READY = """
+    return document.readyState === 'complete' &&
+           (typeof jQuery === 'undefined' || jQuery.active === 0);
+"""
+
+FILE_INPUT_PRESENT = """
+    return document.querySelector("input[type='file']");
+"""
+
+DOM_SETTLED = """
+    return true;
+"""
+
+# Template for the in-page wait. %s is replaced with the condition body.
+_WAIT_SCRIPT = """
+    const done = arguments[arguments.length - 1];
+    const timeoutMs = arguments[0], quietMs = arguments[1], pollMs = arguments[2];
+    const check = function() { %s };
+    const start = performance.now();
+    let finished = false, observer = null, poller = null, deadline = null, quiet = null;
+
+    function finish(met, value) {
+        if (finished) return;
+        finished = true;
+        if (observer) observer.disconnect();
+        clearInterval(poller);
+        clearTimeout(deadline);
+        clearTimeout(quiet);
+        document.removeEventListener('readystatechange', evaluate);
+        done({met: met, value: met ? value : null, elapsed: performance.now() - start});
+    }
+
+    function test() {
+        try { return check(); } catch (e) { return null; }
+    }
+
+    function evaluate() {
+        if (finished) return;
+        const value = test();
+        if (!value) {
+            clearTimeout(quiet);
+            quiet = null;
+            return;
+        }
+        if (quietMs <= 0) {
+            finish(true, value);
+            return;
+        }
+        // Require the DOM to stay unchanged for quietMs before accepting the condition
+        clearTimeout(quiet);
+        quiet = setTimeout(function() {
+            const again = test();
+            if (again) finish(true, again);
+        }, quietMs);
+    }
+
+    observer = new MutationObserver(evaluate);
+    observer.observe(document.documentElement || document, {
+        childList: true, subtree: true, attributes: true, characterData: true
+    });
+    document.addEventListener('readystatechange', evaluate);
+    // Conditions on state the observer cannot see (URL, jQuery) are re-checked periodically
+    poller = setInterval(function() { if (!quiet) evaluate(); }, pollMs);
+    deadline = setTimeout(function() { finish(false, null); }, timeoutMs);
+    evaluate();
+"""
+
+
+class WaitEngine:
+    """Run bounded, condition-based waits against a driver and record how long each phase took"""
+
+    def __init__(self, driver, timeouts=None):
+        self.driver = driver
+        self.timeouts = dict(Config.WAIT_PHASE_TIMEOUTS)
+        if timeouts:
+            self.timeouts.update(timeouts)
+        self.timings = {}   # phase -> seconds actually spent waiting
+        self.outcomes = {}  # phase -> whether the condition was met before the bound
+
+    def until(self, phase, condition, timeout=None, quiet_ms=0, poll_ms=250):
+        """Wait until the JavaScript condition is truthy and return its value (None on timeout)"""
+        if timeout is None:
+            timeout = self.timeouts.get(phase, Config.SELENIUM_ELEMENT_TIMEOUT)
+        script = _WAIT_SCRIPT % condition
+        start = time.monotonic()
+        deadline = start + timeout
+        value = None
+        met = False
+        errors = 0
+
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    self.driver.set_script_timeout(remaining + SCRIPT_TIMEOUT_MARGIN)
+                    outcome = self.driver.execute_async_script(
+                        script, int(remaining * 1000), quiet_ms, poll_ms
+                    )
+                except Exception as e:
+                    # Navigation unloads the document mid-wait; re-arm the wait on the new page
+                    errors += 1
+                    if errors >= MAX_SCRIPT_ERRORS:
+                        raise
+                    logger.debug(f"Wait '{phase}' interrupted ({e}), retrying")
+                    continue
+                errors = 0
+                if outcome and outcome.get("met"):
+                    value = outcome.get("value")
+                    met = True
+                break
+        finally:
+            self._record(phase, time.monotonic() - start, met)
+
+        if not met:
+            logger.info(f"Wait '{phase}' hit its {timeout}s bound")
+        return value
+
+    def page_ready(self, phase="page_load", timeout=None):
+        """Wait for a complete document with idle jQuery and a briefly quiet DOM"""
+        if timeout is None:
+            timeout = self.timeouts.get(phase, self.timeouts.get("page_load"))
+        return self.until(phase, PAGE_READY, timeout=timeout, quiet_ms=Config.WAIT_DOM_QUIET_MS)
+
+    def _record(self, phase, elapsed, met):
+        self.timings[phase] = self.timings.get(phase, 0.0) + elapsed
+        self.outcomes[phase] = met
+        logger.info(f"Wait '{phase}' took {elapsed:.2f}s ({'ready' if met else 'timed out'})")
+
+    @property
+    def total(self):
+        return sum(self.timings.values())
+
+    def summary(self):
+        phases = ", ".join(f"{phase}={seconds:.2f}s" for phase, seconds in self.timings.items())
+        return f"{self.total:.2f}s waiting ({phases})"
@@ -0,0 +1,40 @@
+"""
+Parity checks for the HTML-to-text backends.
+
+Every installed backend must give the same text as the html.parser reference,
+in particular around removed tags sitting inline between text nodes.
+
+    python -m pytest test_html_text.py
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from html_text import BACKENDS, available_backends  # noqa: E402
+
+PAGES = [
+    b"<p>Price:<script>var x = 1;</script>$49.99</p>",
+    b"<div>a<header>h</header>b</div>",
+    b"<p>a<style>p {}</style>b<nav>menu</nav>c</p>",
+    b"<p>a<!-- comment -->b</p>",
+    b"<p>x<nav>n<script>s</script></nav>y</p><footer>f</footer>tail",
+    b"<html><head><title>T</title></head><body><h1>Item</h1><span>Used</span> - <b>$12</b></body></html>",
+    "<p>Café<script>x</script>crème</p>".encode("latin-1"),
+]
+
+OTHER_BACKENDS = [name for name in available_backends() if name != "html.parser"]
+
+
+@pytest.mark.parametrize("backend", OTHER_BACKENDS)
+@pytest.mark.parametrize("page", PAGES)
+def test_backend_matches_html_parser(backend, page):
+    charset = "latin-1" if b"\xe9" in page else None
+    assert BACKENDS[backend](page, charset) == BACKENDS["html.parser"](page, charset)
+
+
+def test_removed_tag_keeps_words_apart():
+    for backend in available_backends():
+        assert BACKENDS[backend](b"<p>Price:<script>x</script>$49.99</p>") == "Price: $49.99"
@@ -22,8 +22,8 @@ interface OpenLensResponse {
   request_id: string;
   google_lens_links_found: number | string;
   scraped_content_length: number;
-  csv_file: string;
-  content_file: string;
+  csv_file: string | null;
+  content_file: string | null;
 }
 
 export const analyzeImageWithOpenLens = async (